@@ -1,56 +1,79 @@
 from toptree import Tree
-from parser import parse_dimacs_maxflow
+from parser import parse_dimacs_edges
 from kruskal import kruskal_minimum_spanning_forest
 import time
 from naive import DynamicMST
+import argparse
+import resource
 import sys
-tree = Tree()
-set_ = set()
-fn = sys.argv[1]
-
-edges_ = parse_dimacs_maxflow(fn)
-set_ = set()
-edges = []
-edges_k = []
-
-times = []
-for u,v,c in edges_:
-    if (str(u),str(v)) in set_ or (str(v),str(u)) in set_:
-        continue
-    set_.add((str(u),str(v)))
-    edges.append((u,v,c))
-    edges_k.append((u.name,v.name,c))
-
-
-start = time.time()
-for u,v,c in edges:
-    C = tree.expose(u,v)
-    if C is None:
-        tree.link(u,v,c)
-    elif C.data.max_cost > c:
-        tree.cut(C.data.ptr)
-        tree.link(u,v,c)
-end = time.time()
-
-times.append([0,0,0])
-times[-1][0] = end-start
-start = time.time()
-f = kruskal_minimum_spanning_forest(edges_k)
-end = time.time()
-times[-1][1] = end-start
-start = time.time()
-dynamic_mst = DynamicMST()
-for u, v, c in edges_k:
-    updated = dynamic_mst.add_edge(u, v, c)
-
-end = time.time()
-times[-1][2] = end-start
-print(f"""
-    filename: {fn}
-    Time to run toptree: {times[0][0]}
-    Time to run kruskal offline: {times[0][1]}
-    Time to run naive algorithm: {times[0][2]}
-    # Sum for toptree: {sum(sum(a.cluster.data.max_cost for a in r.get_levels()[-1]) for r in tree.roots)}
-    # Sum for kruskal: {sum(x for _,_,x in f)}
-    # Sum for naive:  {sum(x for _,_,x in dynamic_mst.get_mst_edges())}
-    """)
\ No newline at end of file
+
+# Usage: pypy3 algorithms.py tests/test50k.max [--engines toptree,kruskal,naive] [--memory-budget-mb N]
+# All engines read the same integer edge list (parser.EdgeList). With --memory-budget-mb the peak
+# resident set size is checked after every engine and the run fails once it goes over the budget.
+ENGINES = ('toptree', 'kruskal', 'naive')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_toptree(edges):
+    tree = Tree()
+    for u, v, c in edges:
+        C = tree.expose(u, v)
+        if C is None:
+            tree.link(u, v, c)
+        elif C.data.max_cost > c:
+            tree.cut(C.data.ptr)
+            tree.link(u, v, c)
+    return sum(r.total_weight for r in tree.roots)
+
+
+def run_kruskal(edges):
+    return sum(x for _, _, x in kruskal_minimum_spanning_forest(edges))
+
+
+def run_naive(edges):
+    dynamic_mst = DynamicMST()
+    for u, v, c in edges:
+        dynamic_mst.add_edge(u, v, c)
+    return sum(x for _, _, x in dynamic_mst.get_mst_edges())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the minimum spanning forest engines on a DIMACS graph')
+    parser.add_argument('filename')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='comma separated subset of ' + ', '.join(ENGINES))
+    parser.add_argument('--memory-budget-mb', type=float, default=None, help='fail when the peak RSS exceeds this many MiB')
+    args = parser.parse_args()
+    engines = args.engines.split(',')
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error(f'unknown engine {engine!r}')
+    runners = {'toptree': run_toptree, 'kruskal': run_kruskal, 'naive': run_naive}
+    names = {'toptree': 'toptree', 'kruskal': 'kruskal offline', 'naive': 'naive algorithm'}
+
+    start = time.time()
+    edges = parse_dimacs_edges(args.filename)
+    end = time.time()
+    print(f"""
+    filename: {args.filename}
+    Vertices: {edges.num_vertices}, edges: {len(edges)} ({edges.nbytes() >> 20} MiB of edge storage)
+    Time to parse: {end-start}""")
+
+    over_budget = False
+    for engine in engines:
+        start = time.time()
+        total = runners[engine](edges)
+        end = time.time()
+        peak = peak_rss_mb()
+        print(f"""    Time to run {names[engine]}: {end-start}
+    # Sum for {engine}: {total}
+    # Peak RSS after {engine}: {peak:.0f} MiB""")
+        if args.memory_budget_mb is not None and peak > args.memory_budget_mb:
+            print(f"    Memory budget of {args.memory_budget_mb:.0f} MiB exceeded")
+            over_budget = True
+            break
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,140 @@
+import math
+import os
+import random
+import statistics
+import time
+import unittest
+from toptree import Tree
+
+# Microbenchmarks for single link, cut and expose calls on forests of a fixed shape.
+#
+#   python3 -m unittest bench_toptree -v
+#   TOPTREE_BENCH_SIZES=1000,10000,100000,1000000 pypy3 -m unittest bench_toptree -v
+#
+# Every shape is built at each size with Tree.link_many, then SAMPLES random edges are cut and
+# linked back one at a time and SAMPLES random pairs are exposed, each call timed on its own.
+# The median time per call is fitted against log n on a log-log scale, as time ~ c * (log n)^p:
+# an O(log n) operation gives a power near 1, somewhat above it once larger forests stop fitting
+# in the caches, while polynomial growth shows up far higher (n^0.3 over 1000..16000 is p = 2.4,
+# n^0.5 is p = 4). An operation fails when its power goes over MAX_LOG_POWER, on every shape;
+# the default leaves room for the cache effects (up to about 1.8 here on random trees).
+# Complete binary trees currently fail link and cut: an update there rebuilds far more than
+# O(log n) clusters (about 350 per link or cut at n = 1000, 1150 at n = 16000).
+SIZES = [int(x) for x in os.environ.get('TOPTREE_BENCH_SIZES', '1000,4000,16000').split(',')]
+SAMPLES = int(os.environ.get('TOPTREE_BENCH_SAMPLES', '200'))
+MAX_LOG_POWER = float(os.environ.get('TOPTREE_BENCH_MAX_LOG_POWER', '2.5'))
+SHAPES = ('path', 'star', 'caterpillar', 'binary', 'random')
+
+
+def make_forest(shape, n, seed=0):
+    # edges (u, v, w) of a tree on vertices 0..n-1
+    rng = random.Random(seed)
+    if shape == 'path':
+        parents = [i - 1 for i in range(1, n)]
+    elif shape == 'star':
+        parents = [0] * (n - 1)
+    elif shape == 'caterpillar':
+        # a spine 0..n/2-1 with one leg hanging off every spine vertex
+        spine = n // 2
+        parents = [i - 1 for i in range(1, spine)] + [i - spine for i in range(spine, n)]
+    elif shape == 'binary':
+        parents = [(i - 1) // 2 for i in range(1, n)]
+    elif shape == 'random':
+        parents = [rng.randrange(i) for i in range(1, n)]
+    else:
+        raise ValueError(f"Unknown shape {shape!r}")
+    return [(i, p, rng.randint(1, 1000)) for i, p in enumerate(parents, 1)]
+
+
+def fit_exponent(sizes, times):
+    # least squares slope of log(time) against log(n)
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in times]
+    mx, my = statistics.fmean(xs), statistics.fmean(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def fit_log_power(sizes, times):
+    # least squares slope of log(time) against log(log(n))
+    return fit_exponent([math.log(n) for n in sizes], times)
+
+
+def measure(shape, n, samples=SAMPLES, seed=0):
+    # median seconds per link, cut and expose call at steady state
+    rng = random.Random(seed)
+    edges = make_forest(shape, n, seed)
+    tree = Tree()
+    leaves = tree.link_many(edges)
+    timer = time.perf_counter
+    link, cut, expose = [], [], []
+    for i in rng.sample(range(len(edges)), min(samples, len(edges))):
+        u, v, w = edges[i]
+        start = timer()
+        tree.cut(leaves[i])
+        middle = timer()
+        leaves[i] = tree.link(u, v, w)
+        end = timer()
+        cut.append(middle - start)
+        link.append(end - middle)
+    for _ in range(samples):
+        u, v = rng.sample(range(n), 2)
+        start = timer()
+        tree.expose(u, v)
+        expose.append(timer() - start)
+    return {'link': statistics.median(link), 'cut': statistics.median(cut), 'expose': statistics.median(expose)}
+
+
+class BenchToptree(unittest.TestCase):
+    results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        print()
+        print(f"{'shape':<12}{'op':<8}" + ''.join(f'{n:>12}' for n in SIZES) + f"{'log power':>10}")
+        for shape, by_size in cls.results.items():
+            for op in ('link', 'cut', 'expose'):
+                times = [by_size[n][op] for n in SIZES]
+                row = ''.join(f'{t * 1e6:>10.1f}us' for t in times)
+                print(f'{shape:<12}{op:<8}{row}{fit_log_power(SIZES, times):>10.2f}')
+
+    def check_shape(self, shape):
+        by_size = {n: measure(shape, n) for n in SIZES}
+        self.results[shape] = by_size
+        if len(SIZES) < 2:
+            return
+        for op in ('link', 'cut', 'expose'):
+            power = fit_log_power(SIZES, [by_size[n][op] for n in SIZES])
+            self.assertLess(power, MAX_LOG_POWER, f'{op} on a {shape} scales as (log n)^{power:.2f}')
+
+    def test_path(self):
+        self.check_shape('path')
+
+    def test_star(self):
+        self.check_shape('star')
+
+    def test_caterpillar(self):
+        self.check_shape('caterpillar')
+
+    def test_binary(self):
+        self.check_shape('binary')
+
+    def test_random(self):
+        self.check_shape('random')
+
+
+class TestShapes(unittest.TestCase):
+    def test_shapes_are_trees(self):
+        for shape in SHAPES:
+            edges = make_forest(shape, 101)
+            self.assertEqual(len(edges), 100, shape)
+            self.assertEqual(len(Tree.from_forest(edges).roots), 1, shape)
+
+    def test_fit_exponent(self):
+        self.assertAlmostEqual(fit_exponent([10, 100, 1000], [2, 2, 2]), 0.0)
+        self.assertAlmostEqual(fit_exponent([10, 100, 1000], [1, 10, 100]), 1.0)
+        self.assertAlmostEqual(fit_log_power([10, 100, 1000], [1, 2, 3]), 1.0)
+        self.assertAlmostEqual(fit_log_power([10, 100, 1000], [1, 4, 9]), 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,360 @@
+from bisect import bisect_left, insort
+from toptree import Tree
+
+# Key of a forest edge on its own level. It is below every weight, so the smaller half of a cut
+# hands out its tree edges of the level being searched before any of its non-tree edges.
+TREE_EDGE = float('-inf')
+
+
+class Level:
+    """
+    Level i of the Holm, de Lichtenberg and Thorup structure.
+    Attributes:
+        forest (Tree): The forest edges of level >= i. Edge keys (Tree.set_key) are TREE_EDGE for
+        the edges of level exactly i, or the weight of the lightest level i non-tree edge at an
+        endpoint anchored on the edge.
+        leaves (dict): (u, v) with u < v -> leaf cluster of the forest edge in forest.
+        non_tree (dict): vertex -> sorted list of (weight, neighbor) over the non-tree edges of level i.
+        anchors (dict): vertex with level i non-tree edges -> leaf cluster at the vertex in forest
+        that carries them.
+    """
+    __slots__ = ('forest', 'leaves', 'non_tree', 'anchors')
+
+    def __init__(self):
+        self.forest = Tree()
+        self.leaves = {}
+        self.non_tree = {}
+        self.anchors = {}
+
+
+class DynamicMSF:
+    """
+    Fully dynamic minimum spanning forest layered on toptree.Tree.
+
+    Edges rejected by an insertion are not thrown away as in algorithms.py: they stay as non-tree
+    edges, so that deleting a forest edge can bring in the lightest replacement.
+
+    Replacement search uses the levels of Holm, de Lichtenberg and Thorup. Every edge has a level,
+    levels[i].forest holds the forest edges of level >= i and the endpoints of a level i non-tree
+    edge are in one tree of it. A tree of levels[i].forest has at most n / 2^i vertices, n being
+    the number of vertices seen so far, so there are at most log2(n) + 1 levels. levels[0].forest
+    carries the edge weights and answers path maxima for insertions.
+
+    Deleting a forest edge cuts it on every level up to its own, and each of those levels is
+    searched from the smaller of the two halves through the edge keys of its forest
+    (Tree.min_key_edge), without visiting the other vertices of the half. The tree edges of that
+    level in the half move one level up first, then its non-tree edges of that level come out in
+    weight order: those with both endpoints in the half move up too, the others join the halves.
+    HDT link the first joining edge they find, going down from the top level. That edge is the
+    lightest one only under their cycle invariant, which arbitrary insertions do not keep, so
+    here the levels above 0 are searched to the end and level 0 up to its first joining edge.
+    The lightest joining edge is linked on its own level, or on the highest level below it
+    where the joined tree still fits, and the other joining edges stay on their level unless it
+    is above that one.
+
+    Cost: every move up is a few top tree operations and is paid for by the level the edge gains,
+    at most log2(n) per edge, which gives the O(log^2 n) amortized part of a deletion as in HDT.
+    On top of that, every non-tree edge above level 0 that joins the two halves costs O(log n),
+    and those above the level of the replacement lose their levels, which they can gain again
+    later. Insertions that push a forest edge out and weight increases of forest edges search
+    the same way. Without the cycle invariant these terms are not bounded by a polylog of n:
+    a workload that cuts the same tree edges over and over keeps paying for the same joining
+    edges, and the bound per update is then linear in the number of those edges.
+
+    Vertices are integer ids and there is at most one edge per vertex pair.
+    Attributes:
+        tree_edges (dict): (u, v) with u < v -> leaf cluster of the forest edge in levels[0].forest.
+        non_tree_edges (dict): (u, v) with u < v -> weight of the non-tree edge.
+        levels (list[Level]): The levels, created as edges first reach them.
+        level_of (dict): (u, v) with u < v -> level of the edge.
+    """
+
+    def __init__(self):
+        self.levels = [Level()]
+        self.tree_edges = self.levels[0].leaves
+        self.non_tree_edges = {}
+        self.level_of = {}
+
+    @staticmethod
+    def _key(u, v):
+        return (u, v) if u < v else (v, u)
+
+    def __len__(self):
+        return len(self.tree_edges) + len(self.non_tree_edges)
+
+    def __contains__(self, edge):
+        key = self._key(*edge)
+        return key in self.tree_edges or key in self.non_tree_edges
+
+    def weight_of(self, u, v):
+        key = self._key(u, v)
+        if key in self.tree_edges:
+            return self.tree_edges[key].data.max_cost
+        return self.non_tree_edges[key]
+
+    def is_tree_edge(self, u, v):
+        return self._key(u, v) in self.tree_edges
+
+    def _level(self, i):
+        while len(self.levels) <= i:
+            self.levels.append(Level())
+        return self.levels[i]
+
+    def _size(self, i, x):
+        # vertices in the tree of x on level i
+        summary = self.levels[i].forest.component_summary(x)
+        return 1 if summary is None else summary.vertices
+
+    def _refresh(self, i, leaf):
+        # recompute the key of a forest edge on level i
+        level = self.levels[i]
+        u, v = leaf.arc1.head.name, leaf.arc2.head.name
+        key = TREE_EDGE if self.level_of[self._key(u, v)] == i else None
+        for x in (u, v):
+            if level.anchors.get(x) is leaf:
+                w = level.non_tree[x][0][0]
+                if key is None or w < key:
+                    key = w
+        level.forest.set_key(leaf, key)
+
+    def _anchor(self, i, x):
+        # after the level i non-tree edges at x or the forest edges at x changed
+        level = self.levels[i]
+        old = level.anchors.pop(x, None)
+        new = level.forest.incident_edge(x) if x in level.non_tree else None
+        if new is not None:
+            level.anchors[x] = new
+            self._refresh(i, new)
+        if old is not None and old is not new:
+            # unless the old anchor was just cut from this level
+            if level.leaves.get(self._key(old.arc1.head.name, old.arc2.head.name)) is old:
+                self._refresh(i, old)
+
+    def _link_level(self, i, edges):
+        # put forest edges (u, v, w) on level i, their level_of is already set
+        level = self._level(i)
+        for (u, v, _), leaf in zip(edges, level.forest.link_many(edges)):
+            key = self._key(u, v)
+            level.leaves[key] = leaf
+            self._refresh(i, leaf)
+            for x in key:
+                if x in level.non_tree and x not in level.anchors:
+                    self._anchor(i, x)
+
+    def _cut_levels(self, key):
+        # take a forest edge off every level it is on
+        for i in range(self.level_of[key] + 1):
+            level = self.levels[i]
+            leaf = level.leaves.pop(key)
+            level.forest.cut(leaf)
+            for x in key:
+                if level.anchors.get(x) is leaf:
+                    self._anchor(i, x)
+
+    def _link(self, u, v, w, level=0):
+        # the weight is kept on level 0 only, the forests above carry keys
+        self.level_of[self._key(u, v)] = level
+        for i in range(level + 1):
+            self._link_level(i, [(u, v, w if i == 0 else 0)])
+
+    def _cut(self, u, v):
+        key = self._key(u, v)
+        w = self.tree_edges[key].data.max_cost
+        self._cut_levels(key)
+        del self.level_of[key]
+        return w
+
+    def _store_non_tree(self, u, v, w, i=0):
+        key = self._key(u, v)
+        self.non_tree_edges[key] = w
+        self.level_of[key] = i
+        level = self._level(i)
+        for x, y in ((u, v), (v, u)):
+            edges = level.non_tree.setdefault(x, [])
+            insort(edges, (w, y))
+            if edges[0][1] == y:
+                self._anchor(i, x)
+
+    def _drop_non_tree(self, u, v):
+        key = self._key(u, v)
+        w = self.non_tree_edges.pop(key)
+        i = self.level_of.pop(key)
+        level = self.levels[i]
+        for x, y in ((u, v), (v, u)):
+            edges = level.non_tree[x]
+            index = bisect_left(edges, (w, y))
+            del edges[index]
+            if not edges:
+                del level.non_tree[x]
+            if index == 0:
+                self._anchor(i, x)
+        return w
+
+    def _lightest(self, i, side):
+        # (x, y, w) for the lightest level i non-tree edge with x in the tree of side on level i
+        level = self.levels[i]
+        leaf = level.forest.min_key_edge(side)
+        if leaf is None:
+            # side is isolated on this level or its tree carries no keys
+            edges = level.non_tree.get(side) if level.forest.incident_edge(side) is None else None
+            return (side, edges[0][1], edges[0][0]) if edges else None
+        for x in (leaf.arc1.head.name, leaf.arc2.head.name):
+            if level.anchors.get(x) is leaf and level.non_tree[x][0][0] == leaf.key:
+                w, y = level.non_tree[x][0]
+                return x, y, w
+
+    def _search(self, i, u, v, crossing):
+        # The forest edge (u, v) was just cut on level i. Search the smaller half from its level i
+        # edges. Above level 0 every edge joining the halves is taken off the level and appended
+        # to crossing as (w, i, x, y); on level 0 the search stops at the lightest joining edge,
+        # which is returned as (x, y, w) and stays where it is.
+        forest = self.levels[i].forest
+        side = u if self._size(i, u) <= self._size(i, v) else v
+        raised = []
+        leaf = forest.min_key_edge(side)
+        while leaf is not None and leaf.key == TREE_EDGE:
+            key = self._key(leaf.arc1.head.name, leaf.arc2.head.name)
+            self.level_of[key] = i + 1
+            self._refresh(i, leaf)
+            raised.append(key)
+            leaf = forest.min_key_edge(side)
+        if raised:
+            self._link_level(i + 1, [(a, b, 0) for a, b in raised])
+        while True:
+            edge = self._lightest(i, side)
+            if edge is None:
+                return None
+            x, y, w = edge
+            inside = forest.connected(side, y)
+            if i == 0 and not inside:
+                return edge
+            self._drop_non_tree(x, y)
+            if inside:
+                self._store_non_tree(x, y, w, i + 1)
+            else:
+                crossing.append((w, i, x, y))
+
+    def _fit(self, x, y, top):
+        # highest level up to top such that linking x and y on it and every level below keeps
+        # each tree of level i within n / 2^i vertices
+        n = len(self.levels[0].forest.vertices)
+        for i in range(1, top + 1):
+            if (self._size(i, x) + self._size(i, y)) << i > n:
+                return i - 1
+        return top
+
+    def _straddle(self, u, v, a, b, top):
+        # (a, b) was just cut on levels 0..top and u, v are on either side of it on level 0:
+        # highest level up to top on which that is still so
+        if not self.levels[0].forest.connected(u, a):
+            a, b = b, a
+        while top > 0:
+            forest = self.levels[top].forest
+            if forest.connected(u, a) and forest.connected(v, b):
+                break
+            top -= 1
+        return top
+
+    def _reconnect(self, u, v, top, current=None):
+        # Rejoin the halves of the forest edge (u, v), just cut on levels 0..top, with the lightest
+        # edge between them, current included: an edge (w, level, x, y) already off the levels
+        # that wins ties. Returns the edge that was linked, None when the halves stay apart.
+        crossing = []
+        for i in range(top, 0, -1):
+            self._search(i, u, v, crossing)
+        lightest = self._search(0, u, v, crossing)
+        if lightest is not None:
+            x, y, w = lightest
+            self._drop_non_tree(x, y)
+            crossing.append((w, 0, x, y))
+        if current is not None:
+            crossing.append(current)
+        if not crossing:
+            return None
+        best = min(crossing, key=lambda edge: (edge[0], edge is not current, -edge[1]))
+        w, level, x, y = best
+        level = self._fit(x, y, level)
+        self._link(x, y, w, level)
+        for edge in crossing:
+            if edge is not best:
+                # joining edges above the new forest edge would no longer be within one tree there
+                self._store_non_tree(edge[2], edge[3], edge[0], min(edge[1], level))
+        return best
+
+    def insert_edge(self, u, v, w):
+        # returns True when the edge enters the forest
+        if u == v:
+            raise ValueError(f"Self loop on vertex {u}")
+        if (u, v) in self:
+            raise ValueError(f"Edge ({u}, {v}) is already present")
+        data = self.levels[0].forest.path_max(u, v)
+        if data is None:
+            self._link(u, v, w)
+            return True
+        if data.max_cost > w:
+            a, b = data.ptr.arc1.head.name, data.ptr.arc2.head.name
+            top = self.level_of[self._key(a, b)]
+            old = self._cut(a, b)
+            # the new edge rejoins the halves on every level up to this one, edges above it that
+            # joined them come down to it
+            level = self._straddle(u, v, a, b, top)
+            crossing = []
+            for i in range(top, level, -1):
+                self._search(i, a, b, crossing)
+            self._link(u, v, w, level)
+            self._store_non_tree(a, b, old, level)
+            for cw, _, x, y in crossing:
+                self._store_non_tree(x, y, cw, level)
+            return True
+        self._store_non_tree(u, v, w)
+        return False
+
+    def delete_edge(self, u, v):
+        # returns the replacement edge (a, b, w) that entered the forest, if any
+        key = self._key(u, v)
+        if key in self.non_tree_edges:
+            self._drop_non_tree(u, v)
+            return None
+        if key not in self.tree_edges:
+            raise KeyError(f"Edge ({u}, {v}) is not present")
+        top = self.level_of[key]
+        self._cut(u, v)
+        replacement = self._reconnect(u, v, top)
+        if replacement is None:
+            return None
+        w, _, a, b = replacement
+        return a, b, w
+
+    def update_weight(self, u, v, w):
+        # Change the weight of an edge, returns True when it is in the forest afterwards.
+        # Only a lighter non-tree edge or a heavier forest edge can break minimality; every other
+        # case is an in-place update.
+        key = self._key(u, v)
+        if key in self.non_tree_edges:
+            level = self.level_of[key]
+            old = self._drop_non_tree(u, v)
+            if w >= old:
+                self._store_non_tree(u, v, w, level)
+                return False
+            return self.insert_edge(u, v, w)
+        leaf = self.tree_edges[key]
+        if w <= leaf.data.max_cost:
+            self.levels[0].forest.update_weight(leaf, w)
+            return True
+        # search as if the edge were deleted, with the edge itself as the last candidate
+        top = self.level_of[key]
+        self._cut(u, v)
+        current = (w, top, u, v)
+        return self._reconnect(u, v, top, current) is current
+
+    def connected(self, u, v):
+        return self.levels[0].forest.connected(u, v)
+
+    def path_max(self, u, v):
+        return self.levels[0].forest.path_max(u, v)
+
+    def forest_edges(self):
+        return [(c.arc1.head.name, c.arc2.head.name, c.data.max_cost) for c in self.tree_edges.values()]
+
+    def forest_weight(self):
+        return sum(c.data.max_cost for c in self.tree_edges.values())
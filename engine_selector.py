@@ -0,0 +1,419 @@
+"""
+Adaptive front-end over the minimum spanning forest engines.
+
+Edges arrive in batches and queries (connected, path_max) come in between. Which
+engine is cheapest depends on the workload:
+
+    toptree    toptree.Tree, O(log n) per inserted edge and per query
+    naive      naive.DynamicMST, a forest search per inserted edge and per query
+    kruskal    kruskal.BatchKruskal: the batch is sorted and merged into the
+               weight-ordered forest, one union-find pass per batch
+    recompute  like kruskal, but batches are buffered and the forest is only
+               recomputed every recompute_period edges or before a query
+
+AdaptiveMSF tracks the number of vertices, the batch size and the number of
+queries per batch (a moving average). Before every batch it asks its CostModel
+which engine is cheapest for that batch, counting the cost of rebuilding the
+current forest in another engine, and switches when that wins. Every batch
+gets a BatchReport naming the engine that served it.
+
+The per-unit costs of the model are measured by calibrate(), which replays a
+graph through every engine; the command line runs it on a benchmark graph:
+
+    python3 engine_selector.py tests/test3.max --batch-size 64 --calibrate costs.json
+    python3 engine_selector.py tests/test3.max --batch-size 64 --costs costs.json
+"""
+import argparse
+import json
+import math
+import random
+import time
+from dataclasses import asdict, dataclass, field
+
+from kruskal import BatchKruskal
+from naive import DynamicMST
+from toptree import Tree
+
+
+class TopTreeEngine:
+    name = 'toptree'
+
+    def __init__(self, forest):
+        self.tree = Tree()
+        self.leaves = set(self.tree.link_many(forest))
+
+    def insert_batch(self, edges):
+        tree = self.tree
+        for u, v, w in edges:
+            C = tree.expose(u, v)
+            if C is None:
+                self.leaves.add(tree.link(u, v, w))
+            elif C.data.max_cost > w:
+                self.leaves.discard(C.data.ptr)
+                tree.cut(C.data.ptr)
+                self.leaves.add(tree.link(u, v, w))
+
+    def connected(self, u, v):
+        return self.tree.connected(u, v)
+
+    def path_max(self, u, v):
+        data = self.tree.path_max(u, v)
+        return None if data is None else data.max_cost
+
+    def forest(self):
+        return [(c.arc1.head.name, c.arc2.head.name, c.data.max_cost) for c in self.leaves]
+
+
+class NaiveEngine:
+    name = 'naive'
+
+    def __init__(self, forest):
+        self.mst = DynamicMST.from_forest(forest)
+
+    def insert_batch(self, edges):
+        for u, v, w in edges:
+            self.mst.add_edge(u, v, w)
+
+    def connected(self, u, v):
+        if u == v:
+            return True
+        return bool(self.mst.is_connected(u, v))
+
+    def path_max(self, u, v):
+        if u not in self.mst.forest:
+            return None
+        path = self.mst.find_path(u, v)
+        if not path:
+            return None
+        return max(c for _, _, c in path)
+
+    def forest(self):
+        return list(self.mst.get_mst_edges())
+
+
+class KruskalEngine:
+    # Queries go to an adjacency and component index of the forest, built on the first query
+    # after a batch changed it.
+    name = 'kruskal'
+
+    def __init__(self, forest):
+        self.kruskal = BatchKruskal(forest)
+        self._adjacency = None
+        self._component = None
+
+    @property
+    def edges(self):
+        return self.kruskal.forest
+
+    def insert_batch(self, edges):
+        self.kruskal.insert_batch(edges)
+        self._adjacency = None
+
+    def _index(self):
+        if self._adjacency is not None:
+            return
+        adjacency = {}
+        for u, v, w in self.edges:
+            adjacency.setdefault(u, []).append((v, w))
+            adjacency.setdefault(v, []).append((u, w))
+        component = {}
+        for start in adjacency:
+            if start in component:
+                continue
+            component[start] = start
+            stack = [start]
+            while stack:
+                x = stack.pop()
+                for y, _ in adjacency[x]:
+                    if y not in component:
+                        component[y] = start
+                        stack.append(y)
+        self._adjacency, self._component = adjacency, component
+
+    def connected(self, u, v):
+        if u == v:
+            return True
+        self._index()
+        return u in self._component and self._component[u] == self._component.get(v)
+
+    def path_max(self, u, v):
+        if u == v or not self.connected(u, v):
+            return None
+        parent = {u: None}
+        stack = [u]
+        while v not in parent:
+            x = stack.pop()
+            for y, w in self._adjacency[x]:
+                if y not in parent:
+                    parent[y] = (x, w)
+                    stack.append(y)
+        best = None
+        while parent[v] is not None:
+            v, w = parent[v]
+            if best is None or w > best:
+                best = w
+        return best
+
+    def forest(self):
+        return list(self.edges)
+
+
+class RecomputeEngine(KruskalEngine):
+    name = 'recompute'
+
+    def __init__(self, forest, period=4096):
+        super().__init__(forest)
+        self.period = period
+        self.pending = []
+
+    def insert_batch(self, edges):
+        self.pending.extend(edges)
+        if len(self.pending) >= self.period:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            super().insert_batch(self.pending)
+            self.pending = []
+
+    def connected(self, u, v):
+        self.flush()
+        return super().connected(u, v)
+
+    def path_max(self, u, v):
+        self.flush()
+        return super().path_max(u, v)
+
+    def forest(self):
+        self.flush()
+        return super().forest()
+
+
+ENGINES = {engine.name: engine for engine in (TopTreeEngine, NaiveEngine, KruskalEngine, RecomputeEngine)}
+
+
+def make_engine(name, forest, recompute_period=4096):
+    # an engine of the given name holding forest, a list of (u, v, w) edges without cycles
+    if name == 'recompute':
+        return RecomputeEngine(forest, recompute_period)
+    return ENGINES[name](forest)
+
+
+def _default_coefficients():
+    # seconds per unit of CostModel.units, measured with calibrate() on tests/test3.max (CPython)
+    return {
+        'toptree': {'insert': 1.3e-4, 'query': 7.3e-5, 'build': 4.0e-5},
+        'naive': {'insert': 5.0e-7, 'query': 2.8e-7, 'build': 1.5e-6},
+        'kruskal': {'insert': 1.0e-6, 'query': 1.5e-6, 'build': 6.0e-7},
+        'recompute': {'insert': 1.0e-6, 'query': 1.5e-6, 'build': 6.0e-7},
+    }
+
+
+@dataclass
+class CostModel:
+    """
+    Estimated seconds per batch for every engine: a coefficient per engine and operation
+    (insert, query, build) times the work units the engine does for n vertices, a batch of b
+    edges and q queries.
+    Attributes:
+        coefficients (dict): engine -> {'insert': s, 'query': s, 'build': s}, seconds per unit.
+        recompute_period (int): Batch edges the recompute engine buffers without queries.
+    """
+    coefficients : dict = field(default_factory=_default_coefficients)
+    recompute_period : int = 4096
+
+    @staticmethod
+    def units(engine, n, b, q, recompute_period=4096):
+        # (insert units, query units, build units) of one batch
+        log_n = math.log2(n + 2)
+        if engine == 'toptree':
+            return b * log_n, q * log_n, n
+        if engine == 'naive':
+            return b * (n + 1), q * (n + 1), n
+        # a merge pass over the forest after sorting the batch
+        recompute = n + b * math.log2(b + 2)
+        if engine == 'recompute' and q == 0:
+            # one recompute per recompute_period buffered edges
+            recompute *= min(1.0, b / recompute_period)
+        return recompute, q * (n + 1), n
+
+    def estimate(self, engine, n, b, q, switching=False):
+        insert, query, build = self.units(engine, n, b, q, self.recompute_period)
+        c = self.coefficients[engine]
+        cost = c['insert'] * insert + c['query'] * query
+        if switching:
+            cost += c['build'] * build
+        return cost
+
+    def choose(self, n, b, q, current=None):
+        estimates = {engine: self.estimate(engine, n, b, q, engine != current) for engine in ENGINES}
+        return min(estimates, key=estimates.get), estimates
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(asdict(self), file, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls(**json.load(file))
+
+
+@dataclass
+class BatchReport:
+    engine : str
+    edges : int
+    queries : float
+    vertices : int
+    seconds : float
+    switched_from : str = None
+    estimates : dict = None
+
+
+class AdaptiveMSF:
+    """
+    Minimum spanning forest that moves between engines as the workload changes.
+    Attributes:
+        costs (CostModel): Model the engine is chosen by.
+        engine: The engine currently holding the forest.
+        fixed (Optional[str]): Engine name to always use instead of choosing.
+        vertices (set): Every vertex seen in a batch.
+        query_rate (float): Moving average of the queries between two batches.
+        reports (list[BatchReport]): One report per batch, in order.
+    """
+
+    def __init__(self, costs=None, engine=None, smoothing=0.5):
+        self.costs = costs if costs is not None else CostModel()
+        if engine is not None and engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}")
+        self.fixed = engine
+        self.engine = make_engine(engine or 'naive', [], self.costs.recompute_period)
+        self.smoothing = smoothing
+        self.vertices = set()
+        self.queries = 0
+        self.query_rate = 0.0
+        self.reports = []
+
+    def insert_batch(self, edges):
+        edges = [(u, v, w) for u, v, w in edges if u != v]
+        for u, v, _ in edges:
+            self.vertices.add(u)
+            self.vertices.add(v)
+        self.query_rate = self.smoothing * self.query_rate + (1 - self.smoothing) * self.queries
+        queries, self.queries = self.queries, 0
+
+        start = time.perf_counter()
+        switched_from = None
+        estimates = None
+        name = self.fixed
+        if name is None:
+            name, estimates = self.costs.choose(len(self.vertices), len(edges), self.query_rate, self.engine.name)
+        if name != self.engine.name:
+            switched_from = self.engine.name
+            self.engine = make_engine(name, self.engine.forest(), self.costs.recompute_period)
+        self.engine.insert_batch(edges)
+        report = BatchReport(name, len(edges), queries, len(self.vertices), time.perf_counter() - start,
+                             switched_from, estimates)
+        self.reports.append(report)
+        return report
+
+    def insert_edge(self, u, v, w):
+        return self.insert_batch([(u, v, w)])
+
+    def connected(self, u, v):
+        self.queries += 1
+        return self.engine.connected(u, v)
+
+    def path_max(self, u, v):
+        # weight of the heaviest forest edge on the path, None when u and v are not connected
+        self.queries += 1
+        return self.engine.path_max(u, v)
+
+    def forest_edges(self):
+        return self.engine.forest()
+
+    def forest_weight(self):
+        return sum(w for _, _, w in self.engine.forest())
+
+    def engine_counts(self):
+        counts = {}
+        for report in self.reports:
+            counts[report.engine] = counts.get(report.engine, 0) + 1
+        return counts
+
+
+def replay(msf, edges, batch_size, queries_per_batch=1, seed=0):
+    # Feed edges in batches with random path_max queries after each one; returns the seconds
+    # spent in inserts and in queries.
+    rng = random.Random(seed)
+    insert_time = query_time = 0.0
+    seen = []
+    for i in range(0, len(edges), batch_size):
+        batch = [edges[j] for j in range(i, min(i + batch_size, len(edges)))]
+        start = time.perf_counter()
+        msf.insert_batch(batch)
+        insert_time += time.perf_counter() - start
+        for u, v, _ in batch:
+            seen.append(u)
+            seen.append(v)
+        start = time.perf_counter()
+        for _ in range(queries_per_batch):
+            msf.path_max(rng.choice(seen), rng.choice(seen))
+        query_time += time.perf_counter() - start
+    return insert_time, query_time
+
+
+def calibrate(edges, batch_size=64, queries_per_batch=1, engines=('toptree', 'naive', 'kruskal'), base=None):
+    # Fit the coefficients of a CostModel by replaying edges through each engine on its own and
+    # dividing the measured time by the units the model predicts for the same batches. The
+    # recompute engine runs the kruskal code, only less often, and takes its coefficients.
+    model = CostModel() if base is None else CostModel(**asdict(base))
+    for name in engines:
+        msf = AdaptiveMSF(model, engine=name)
+        insert_time, query_time = replay(msf, edges, batch_size, queries_per_batch)
+        insert_units = query_units = 0.0
+        for report in msf.reports:
+            # a report counts the queries made before its batch, the replay asks them after
+            units = CostModel.units(name, report.vertices, report.edges, queries_per_batch, model.recompute_period)
+            insert_units += units[0]
+            query_units += units[1]
+        forest = msf.forest_edges()
+        start = time.perf_counter()
+        make_engine(name, forest, model.recompute_period)
+        build_time = time.perf_counter() - start
+        c = model.coefficients[name]
+        if insert_units:
+            c['insert'] = insert_time / insert_units
+        if query_units:
+            c['query'] = query_time / query_units
+        if forest:
+            c['build'] = build_time / len(msf.vertices)
+    model.coefficients['recompute'] = dict(model.coefficients['kruskal'])
+    return model
+
+
+if __name__ == '__main__':
+    from parser import parse_dimacs_edges
+    parser = argparse.ArgumentParser(description='Run the adaptive MSF front-end over a DIMACS graph in batches')
+    parser.add_argument('filename')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--queries-per-batch', type=int, default=1)
+    parser.add_argument('--costs', help='JSON cost model written by --calibrate')
+    parser.add_argument('--calibrate', metavar='OUT', help='measure every engine and write the cost model to OUT')
+    parser.add_argument('--engine', choices=sorted(ENGINES), help='always use this engine')
+    args = parser.parse_args()
+
+    edges = parse_dimacs_edges(args.filename)
+    costs = CostModel.load(args.costs) if args.costs else None
+    if args.calibrate:
+        model = calibrate(edges, args.batch_size, args.queries_per_batch, base=costs)
+        model.save(args.calibrate)
+        print(json.dumps(asdict(model), indent=2))
+    else:
+        msf = AdaptiveMSF(costs, engine=args.engine)
+        insert_time, query_time = replay(msf, edges, args.batch_size, args.queries_per_batch)
+        print('batch,engine,edges,vertices,queries,seconds,switched_from')
+        for i, report in enumerate(msf.reports):
+            print(f'{i},{report.engine},{report.edges},{report.vertices},{report.queries},{report.seconds:.6f},{report.switched_from or ""}')
+        print(f'# engines: {msf.engine_counts()}')
+        print(f'# insert time: {insert_time:.3f}s, query time: {query_time:.3f}s, forest weight: {msf.forest_weight()}')
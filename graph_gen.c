@@ -1,45 +1,69 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <stdint.h>
 #include <time.h>
 
+/*
+ * Arcs already emitted are kept in an open addressing hash set of u * (nodes + 1) + v keys,
+ * sized to the number of edges rather than nodes * nodes, so that 1M vertex graphs fit in
+ * a few tens of megabytes.
+ */
+static uint64_t *table;
+static uint64_t mask;
+
+static int insert_arc(uint64_t key) {
+    uint64_t i = (key * 0x9E3779B97F4A7C15ULL) & mask;
+    while (table[i]) {
+        if (table[i] == key) return 0;
+        i = (i + 1) & mask;
+    }
+    table[i] = key;
+    return 1;
+}
+
+static int random_below(int n) {
+    /* rand() may only give 15 bits, combine two draws for large graphs */
+    return (int)((((uint64_t)rand() << 15) ^ (uint64_t)rand()) % (uint64_t)n);
+}
+
 int main(int argc, char *argv[]) {
+    if (argc < 3) {
+        fprintf(stderr, "usage: %s nodes edges [seed]\n", argv[0]);
+        return 1;
+    }
     int nodes = atoi(argv[1]);
     int edges = atoi(argv[2]);
-    srand(time(NULL));
-    char **edge_exists = malloc((nodes + 1) * sizeof(char *));
-    if (!edge_exists) {
-        fprintf(stderr, "malloc error\n");
+    if ((long long)edges > (long long)nodes * (nodes - 1)) {
+        fprintf(stderr, "too many edges for %d nodes\n", nodes);
         return 1;
     }
-    for (int i = 0; i <= nodes; i++) {
-        edge_exists[i] = calloc(nodes + 1, sizeof(char));
-        if (!edge_exists[i]) {
-            fprintf(stderr, "calloc error\n");
-            return 1;
-        }
+    srand(argc > 3 ? (unsigned)atoi(argv[3]) : (unsigned)time(NULL));
+    uint64_t size = 1;
+    while (size < 2 * (uint64_t)edges) size <<= 1;
+    mask = size - 1;
+    table = calloc(size, sizeof(uint64_t));
+    if (!table) {
+        fprintf(stderr, "calloc error\n");
+        return 1;
     }
-    
+
     printf("p max %d %d\n", nodes, edges);
-    printf("n 1 s\n"); 
-    printf("n %d t\n", nodes); 
+    printf("n 1 s\n");
+    printf("n %d t\n", nodes);
 
     int count = 0;
     while (count < edges) {
-        int u = rand() % nodes + 1; 
-        int v = rand() % nodes + 1; 
-        if (u == v) continue;       
-        if (edge_exists[u][v]) continue; 
-        
-        edge_exists[u][v] = 1;
-        int capacity = (rand() % 100) + 1; 
+        int u = random_below(nodes) + 1;
+        int v = random_below(nodes) + 1;
+        if (u == v) continue;
+        if (!insert_arc((uint64_t)u * (uint64_t)(nodes + 1) + (uint64_t)v)) continue;
+
+        int capacity = (rand() % 100) + 1;
         printf("a %d %d %d\n", u, v, capacity);
         count++;
     }
-    
-    for (int i = 0; i <= nodes; i++) {
-        free(edge_exists[i]);
-    }
-    free(edge_exists);
-    
+
+    free(table);
+
     return 0;
 }
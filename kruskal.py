@@ -2,9 +2,12 @@ def kruskal_minimum_spanning_forest(edges):
     parent = {}
     rank = {}
     def find(u):
-        if parent[u] != u:
-            parent[u] = find(parent[u])
-        return parent[u]
+        root = u
+        while parent[root] != root:
+            root = parent[root]
+        while parent[u] != root:
+            parent[u], u = root, parent[u]
+        return root
     def union(u, v):
         root_u = find(u)
         root_v = find(v)
@@ -18,6 +21,8 @@ def kruskal_minimum_spanning_forest(edges):
                 rank[root_u] += 1
         return True
 
+    if not hasattr(edges, '__getitem__'):
+        edges = list(edges)
     for u, v, c in edges:
         if u not in parent:
             parent[u] = u
@@ -26,10 +31,87 @@ def kruskal_minimum_spanning_forest(edges):
             parent[v] = v
             rank[v] = 0
 
-    sorted_edges = sorted(edges, key=lambda x: x[2])
+    # sort positions rather than the edges, so compact edge lists are not copied as tuples
+    order = sorted(range(len(edges)), key=lambda i: edges[i][2])
     forest = []
-    for u, v, c in sorted_edges:
+    for i in order:
+        u, v, c = edges[i]
         if union(u, v):
             forest.append((u, v, c))
     return forest
 
+
+
+class BatchKruskal:
+    """
+    Minimum spanning forest maintained offline over edge batches.
+
+    The forest is kept sorted by weight, so a new batch only has to be sorted itself: the forest
+    and the sorted batch are merged and scanned once with a union-find, which gives
+    MSF(forest + batch) in O((n + b) alpha) plus O(b log b) for the sort, instead of re-sorting
+    every edge as kruskal_minimum_spanning_forest does. On equal weights forest edges come first,
+    so they stay in the forest.
+
+    The union-find is reused between batches: vertices get dense indices once and its arrays are
+    reset in place at the start of each pass.
+    Attributes:
+        forest (list): Forest edges (u, v, c), sorted by c.
+        index (dict): vertex -> dense index into parent and rank.
+    """
+
+    def __init__(self, forest=()):
+        self.forest = sorted(forest, key=lambda x: x[2])
+        self.index = {}
+        self.parent = []
+        self.rank = bytearray()
+        for u, v, _ in self.forest:
+            self._add_vertex(u)
+            self._add_vertex(v)
+
+    def __len__(self):
+        return len(self.forest)
+
+    def _add_vertex(self, u):
+        if u not in self.index:
+            self.index[u] = len(self.parent)
+            self.parent.append(len(self.parent))
+            self.rank.append(0)
+
+    def insert_batch(self, edges):
+        batch = sorted(edges, key=lambda x: x[2])
+        for u, v, _ in batch:
+            self._add_vertex(u)
+            self._add_vertex(v)
+        parent, rank, index = self.parent, self.rank, self.index
+        parent[:] = range(len(parent))
+        rank[:] = bytes(len(rank))
+
+        def find(u):
+            root = u
+            while parent[root] != root:
+                root = parent[root]
+            while parent[u] != root:
+                parent[u], u = root, parent[u]
+            return root
+
+        old, new = self.forest, []
+        i = j = 0
+        while i < len(old) or j < len(batch):
+            if j == len(batch) or (i < len(old) and old[i][2] <= batch[j][2]):
+                edge = old[i]
+                i += 1
+            else:
+                edge = batch[j]
+                j += 1
+            root_u, root_v = find(index[edge[0]]), find(index[edge[1]])
+            if root_u == root_v:
+                continue
+            if rank[root_u] < rank[root_v]:
+                parent[root_u] = root_v
+            else:
+                parent[root_v] = root_u
+                if rank[root_u] == rank[root_v]:
+                    rank[root_u] += 1
+            new.append(edge)
+        self.forest = new
+        return new
@@ -0,0 +1,29 @@
+from toptree import Tree
+from parser import parse_dimacs_maxflow
+import sys
+
+# Usage: python3 memory_bench.py tests/test3.max [samples]
+# Prints CSV: memory of the incremental MST top tree against the number of edges processed.
+fn = sys.argv[1]
+samples = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+edges = parse_dimacs_maxflow(fn)
+step = max(1, len(edges) // samples)
+kinds = ('Vertex', 'Arc', 'Data', 'LEAF', 'RAKE', 'COMPRESS', 'DUMMY')
+
+tree = Tree()
+forest_edges = 0
+print(','.join(('edges', 'forest_edges', 'levels', 'total_bytes') + kinds))
+for i, (u, v, c) in enumerate(edges, 1):
+    C = tree.expose(u, v)
+    if C is None:
+        tree.link(u, v, c)
+        forest_edges += 1
+    elif C.data.max_cost > c:
+        tree.cut(C.data.ptr)
+        tree.link(u, v, c)
+    if i % step == 0 or i == len(edges):
+        report = tree.memory_report()
+        row = [i, forest_edges, len(report['levels']), report['total_bytes']]
+        row += [report['bytes'][kind] for kind in kinds]
+        print(','.join(str(x) for x in row), flush=True)
@@ -4,6 +4,16 @@ class DynamicMST:
         self.forest = {}
         self.mst_edges = set()
 
+    @classmethod
+    def from_forest(cls, edges):
+        # bulk load of edges that close no cycle: they go in without the connectivity search
+        mst = cls()
+        for u, v, w in edges:
+            mst.forest.setdefault(u, [])
+            mst.forest.setdefault(v, [])
+            mst._insert_edge(u, v, w)
+        return mst
+
     def add_edge(self, u, v, w):
         if u not in self.forest:
             self.forest[u] = []
@@ -58,20 +68,30 @@ class DynamicMST:
                         deq.append(neighbor)
 
     def find_path(self, start, goal, visited=None):
+        # depth first search with parent pointers, the path is rebuilt once from goal back to start
         if visited is None:
             visited = set()
-            
         if start == goal:
             return []
-        
         visited.add(start)
-        
-        for neighbor, c in self.forest[start]:
-            if neighbor in visited:
-                continue
-            subpath = self.find_path(neighbor, goal, visited)
-            if subpath is not None:
-                return [(start, neighbor, c)] + subpath
+        parent = {start: None}
+        stack = [start]
+        while stack:
+            cur_vertex = stack.pop()
+            for neighbor, c in self.forest[cur_vertex]:
+                if neighbor in visited:
+                    continue
+                visited.add(neighbor)
+                parent[neighbor] = (cur_vertex, c)
+                if neighbor == goal:
+                    path = []
+                    while parent[neighbor] is not None:
+                        prev, c = parent[neighbor]
+                        path.append((prev, neighbor, c))
+                        neighbor = prev
+                    path.reverse()
+                    return path
+                stack.append(neighbor)
         return None
 
     def get_mst_edges(self):
@@ -1,3 +1,4 @@
+from array import array
 from toptree import Vertex
 
 def parse_dimacs_maxflow(filename):
@@ -20,4 +21,68 @@ def parse_dimacs_maxflow(filename):
                     s = vertices[int(parts[1])]
                 elif parts[2] == 't':
                     t = vertices[int(parts[1])]
-    return edges
\ No newline at end of file
+    return edges
+
+
+class EdgeList:
+    """
+    Compact edge storage shared by all engines: endpoints and weights in three parallel arrays
+    instead of one tuple (and two boxed ints) per edge. Indexing and iteration hand out
+    (u, v, c) tuples on the fly.
+    Attributes:
+        num_vertices (int): Vertex ids are 1..num_vertices.
+        u, v (array): Endpoint ids.
+        c (array): Edge weights.
+    """
+
+    def __init__(self, num_vertices=0):
+        self.num_vertices = num_vertices
+        self.u = array('i')
+        self.v = array('i')
+        self.c = array('q')
+
+    def append(self, u, v, c):
+        self.u.append(u)
+        self.v.append(v)
+        self.c.append(c)
+
+    def __len__(self):
+        return len(self.c)
+
+    def __getitem__(self, i):
+        return self.u[i], self.v[i], self.c[i]
+
+    def __iter__(self):
+        return zip(self.u, self.v, self.c)
+
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.u, self.v, self.c))
+
+
+def parse_dimacs_edges(filename):
+    # Integer edge list without self loops and with the first arc kept for every vertex pair,
+    # in either direction. Pairs are remembered as single ints, not as tuples of strings, which
+    # needs the vertex count: an arc before the p line or with an endpoint outside 1..n is an error.
+    edges = EdgeList()
+    seen = set()
+    stride = 0
+    with open(filename, 'r') as file:
+        for line in file:
+            if line.startswith('a'):
+                _, u, v, capacity = line.split()
+                u, v = int(u), int(v)
+                if not stride:
+                    raise ValueError(f"Arc ({u}, {v}) before the p line in {filename}")
+                if not (0 < u < stride and 0 < v < stride):
+                    raise ValueError(f"Arc ({u}, {v}) has an endpoint outside 1..{stride - 1} in {filename}")
+                if u == v:
+                    continue
+                key = u * stride + v if u < v else v * stride + u
+                if key in seen:
+                    continue
+                seen.add(key)
+                edges.append(u, v, int(capacity))
+            elif line.startswith('p'):
+                edges.num_vertices = int(line.split()[2])
+                stride = edges.num_vertices + 1
+    return edges
@@ -0,0 +1,327 @@
+"""
+Local socket service that shares one top tree between many clients.
+
+Clients speak newline-delimited JSON over a localhost TCP or Unix socket:
+
+    {"id": 1, "op": "insert_edge", "u": 3, "v": 7, "w": 12}
+    {"id": 2, "op": "path_max", "u": 3, "v": 9}
+    {"id": 3, "op": "connected", "u": 3, "v": 9}
+    {"id": 4, "op": "stats"}
+
+Every reply echoes the request id: {"id": 1, "result": true}. Replies on a
+connection come back in request order.
+
+insert_edge maintains a minimum spanning forest the same way algorithms.py
+does, path_max answers {"weight": w, "edge": [a, b]} for the heaviest forest
+edge on the path (or null) and connected answers a boolean.
+
+Requests from all clients go through one queue. A batcher task drains it into
+micro-batches bounded by max_batch_size and max_batch_delay and applies each
+batch to the tree in arrival order. Inside a batch, runs of insertions that
+join different components are coalesced into a single Tree.link_many call so
+they share the rake/compress rounds of one update.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+
+from toptree import Tree
+
+
+class BatchingServer:
+
+    def __init__(self, max_batch_size=256, max_batch_delay=0.002, path_cache_size=0):
+        self.tree = Tree(path_cache_size)
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.queue : asyncio.Queue = None
+        self.started = time.perf_counter()
+        self.requests_served = 0
+        self.batches_served = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self._servers = []
+        self._batcher = None
+        self._clients = set()
+
+    @staticmethod
+    def _check_vertex(request, key):
+        # vertex ids are JSON integers or strings; booleans would alias 0 and 1
+        x = request[key]
+        if isinstance(x, bool) or not isinstance(x, (int, str)):
+            raise ValueError(f'{key} must be an integer or a string, got {x!r}')
+        return x
+
+    @staticmethod
+    def _check_weight(request):
+        w = request['w']
+        if isinstance(w, bool) or not isinstance(w, (int, float)) or not math.isfinite(w):
+            raise ValueError(f'w must be a finite number, got {w!r}')
+        return w
+
+    @staticmethod
+    def _component(vertex):
+        if not vertex.handle:
+            return id(vertex)
+        return id(vertex.get_root())
+
+    @staticmethod
+    def _find(groups, key):
+        while key in groups:
+            key = groups[key]
+        return key
+
+    def _flush(self, pending, groups):
+        self.tree.link_many(pending)
+        pending.clear()
+        groups.clear()
+
+    def _insert(self, u, v, w):
+        C = self.tree.expose(u, v)
+        if C is None:
+            self.tree.link(u, v, w)
+            return True
+        if C.data.max_cost > w:
+            self.tree.cut(C.data.ptr)
+            self.tree.link(u, v, w)
+            return True
+        return False
+
+    def _path_max(self, u, v):
+        data = self.tree.path_max(u, v)
+        if data is None:
+            return None
+        return {
+            'weight': data.max_cost,
+            'edge': [data.ptr.arc1.head.name, data.ptr.arc2.head.name],
+        }
+
+    def apply_batch(self, requests):
+        results = []
+        pending = []
+        groups = {}
+        for request in requests:
+            op = request.get('op')
+            try:
+                if op == 'insert_edge':
+                    u, v = self._check_vertex(request, 'u'), self._check_vertex(request, 'v')
+                    w = self._check_weight(request)
+                    u, v = self.tree.vertex(u), self.tree.vertex(v)
+                    if u is v:
+                        results.append({'result': False})
+                        continue
+                    root_u = self._find(groups, self._component(u))
+                    root_v = self._find(groups, self._component(v))
+                    if root_u != root_v:
+                        # joins two components, cannot close a cycle: defer into one link_many
+                        groups[root_u] = root_v
+                        pending.append((u, v, w))
+                        results.append({'result': True})
+                        continue
+                    if pending:
+                        self._flush(pending, groups)
+                    results.append({'result': self._insert(u, v, w)})
+                elif op == 'path_max' or op == 'connected':
+                    u, v = self._check_vertex(request, 'u'), self._check_vertex(request, 'v')
+                    if pending:
+                        self._flush(pending, groups)
+                    if op == 'connected':
+                        results.append({'result': self.tree.connected(u, v)})
+                    else:
+                        results.append({'result': self._path_max(u, v)})
+                else:
+                    results.append({'error': f'unknown op {op!r}'})
+            except (KeyError, TypeError, ValueError) as e:
+                results.append({'error': f'malformed request: {e}'})
+        if pending:
+            self._flush(pending, groups)
+        return results
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'requests': self.requests_served,
+            'batches': self.batches_served,
+            'mean_batch_size': self.requests_served / self.batches_served if self.batches_served else 0.0,
+            'throughput': self.requests_served / elapsed if elapsed > 0 else 0.0,
+            'busy_throughput': self.requests_served / self.busy_time if self.busy_time > 0 else 0.0,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'max_batch_size': self.max_batch_size,
+            'max_batch_delay': self.max_batch_delay,
+            'path_cache': self.tree.cache_stats(),
+        }
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            batch.append(await self.queue.get())
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # shutting down: the requests taken so far go back for close() to fail
+            for item in batch:
+                self.queue.put_nowait(item)
+            raise
+        return batch
+
+    async def _run_batches(self):
+        while True:
+            batch = await self._collect()
+            start = time.perf_counter()
+            try:
+                results = self.apply_batch([request for request, _ in batch])
+            except Exception as e:
+                # fail this batch only, the batcher keeps serving the next ones
+                results = [{'error': f'internal error: {e!r}'}] * len(batch)
+            self.busy_time += time.perf_counter() - start
+            self.requests_served += len(batch)
+            self.batches_served += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def submit(self, request):
+        if request.get('op') == 'stats':
+            return {'result': self.stats()}
+        if self._batcher is None:
+            raise ConnectionError('server is shutting down')
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def _reply(self, writer, replies):
+        while True:
+            item = await replies.get()
+            if item is None:
+                break
+            request_id, future = item
+            try:
+                response = await future
+            except ConnectionError as e:
+                response = {'error': str(e)}
+            response = {'id': request_id, **response}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    async def _handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._clients.add(task)
+        replies = asyncio.Queue()
+        replier = asyncio.ensure_future(self._reply(writer, replies))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('request must be a JSON object')
+                except ValueError as e:
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result({'error': f'invalid request: {e}'})
+                    await replies.put((None, future))
+                    continue
+                await replies.put((request.get('id'), asyncio.ensure_future(self.submit(request))))
+        except asyncio.CancelledError:
+            # close() cancels the handlers; the stream callback treats a cancelled handler as an
+            # error, so this one stops reading and still answers what it has received
+            pass
+        finally:
+            await replies.put(None)
+            await replier
+            writer.close()
+            self._clients.discard(task)
+
+    def _start_batcher(self):
+        if self._batcher is None:
+            self.queue = asyncio.Queue()
+            self.started = time.perf_counter()
+            self._batcher = asyncio.ensure_future(self._run_batches())
+
+    async def start_tcp(self, host='127.0.0.1', port=0):
+        self._start_batcher()
+        server = await asyncio.start_server(self._handle_client, host, port)
+        self._servers.append(server)
+        return server
+
+    async def start_unix(self, path):
+        self._start_batcher()
+        server = await asyncio.start_unix_server(self._handle_client, path)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        # Stop accepting, stop the batcher and fail every request it has not answered, then
+        # cancel the client handlers: each one sends those failures as error replies and closes
+        # its connection before it exits.
+        for server in self._servers:
+            server.close()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        while self.queue is not None and not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(ConnectionError('server is shutting down'))
+        clients = list(self._clients)
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+
+async def _serve(args):
+    service = BatchingServer(args.max_batch_size, args.max_batch_delay_ms / 1000, args.path_cache_size)
+    if args.unix:
+        server = await service.start_unix(args.unix)
+        print(f'listening on {args.unix}')
+    else:
+        server = await service.start_tcp(args.host, args.port)
+        print(f'listening on {args.host}:{server.sockets[0].getsockname()[1]}')
+    try:
+        if args.report_every <= 0:
+            await asyncio.Event().wait()
+        while True:
+            await asyncio.sleep(args.report_every)
+            print(json.dumps(service.stats()), flush=True)
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve minimum spanning forest queries over a local socket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket path instead of TCP')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-batch-delay-ms', type=float, default=2.0)
+    parser.add_argument('--path-cache-size', type=int, default=0, help='LRU capacity for repeated path_max pairs')
+    parser.add_argument('--report-every', type=float, default=10.0, help='seconds between stats lines')
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
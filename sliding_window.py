@@ -0,0 +1,144 @@
+from collections import deque
+from dynamic_msf import DynamicMSF
+
+
+class SlidingWindowMSF:
+    """
+    Minimum spanning forest over the edges of a timestamped stream that arrived in the last
+    `window` time units, maintained on a DynamicMSF.
+
+    Edges arrive as (u, v, w, t) with non-decreasing t. An edge is live while t > now - window.
+    Several live edges may join the same pair; only the lightest of them matters for the forest.
+    For each pair the live edges are kept in a deque with strictly increasing weights from the
+    oldest to the newest: a new edge evicts every older edge that is not lighter, since those
+    expire first anyway. The front of the deque is the edge the DynamicMSF holds for that pair.
+
+    A slide makes at most one DynamicMSF update per arriving and per expiring edge, and none for
+    edges that were evicted from their pair, so its cost is that of those DynamicMSF updates:
+    O(log^2 n) amortized for the level moves, plus O(log n) for every non-tree edge above
+    level 0 that joins the two halves of a removed forest edge (see DynamicMSF). Expiring
+    edges are handled as one batch. Pairs left without a live edge are deleted and pairs whose
+    lightest edge expires while a heavier one is live go through DynamicMSF.update_weight, in
+    this order: non-tree deletions, non-tree updates, forest updates, forest deletions. Every
+    replacement search then runs over the live weights of the batch and never picks an edge
+    that expires in it.
+    Attributes:
+        window: Length of the window, in the same unit as the timestamps.
+        now: Latest time the window was advanced to.
+        msf (DynamicMSF): Forest over the front edge of every live pair.
+        arrivals (deque): [t, u, v, w] in arrival order, dominated edges included.
+        pairs (dict): (u, v) with u < v -> deque of arrival entries, lightest and oldest first.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.now = None
+        self.msf = DynamicMSF()
+        self.arrivals = deque()
+        self.pairs = {}
+        self.arrived = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.arrivals)
+
+    def add_edge(self, u, v, w, t):
+        self.add_edges([(u, v, w, t)])
+
+    def add_edges(self, edges):
+        edges = list(edges)
+        if not edges:
+            return
+        times = [t for _, _, _, t in edges]
+        if any(b < a for a, b in zip(times, times[1:])) or (self.now is not None and times[0] < self.now):
+            raise ValueError("Edge timestamps must be non-decreasing")
+        self.advance(times[-1])
+        horizon = self.now - self.window
+        for u, v, w, t in edges:
+            if t <= horizon:
+                continue
+            self._arrive(u, v, w, t)
+
+    def _arrive(self, u, v, w, t):
+        if u == v:
+            return
+        key = (u, v) if u < v else (v, u)
+        entry = [t, u, v, w]
+        self.arrivals.append(entry)
+        self.arrived += 1
+        live = self.pairs.get(key)
+        if live is None:
+            self.pairs[key] = deque([entry])
+            self.msf.insert_edge(u, v, w)
+            return
+        front = live[0]
+        while live and live[-1][3] >= w:
+            live.pop()
+        live.append(entry)
+        if live[0] is not front:
+            # the new edge is lighter than every live edge on this pair
+            self.msf.update_weight(u, v, w)
+
+    def advance(self, now):
+        if self.now is not None and now < self.now:
+            raise ValueError("Time cannot go backwards")
+        self.now = now
+        horizon = now - self.window
+        expiring = []
+        while self.arrivals and self.arrivals[0][0] <= horizon:
+            expiring.append(self.arrivals.popleft())
+        if not expiring:
+            return 0
+        self.expired += len(expiring)
+
+        # keys whose current front expires, and the entry that takes over (None when the pair dies)
+        changed = {}
+        for entry in expiring:
+            _, u, v, _ = entry
+            key = (u, v) if u < v else (v, u)
+            live = self.pairs[key]
+            if live[0] is not entry:
+                # evicted earlier by a lighter newer edge
+                continue
+            live.popleft()
+            changed[key] = live[0] if live else None
+            if not live:
+                del self.pairs[key]
+
+        # the split into forest and non-tree pairs is taken once: a step can only bring into the
+        # forest non-tree pairs that an earlier step has already handled
+        tree_keys = {key for key in changed if self.msf.is_tree_edge(*key)}
+        for key, successor in changed.items():
+            if successor is None and key not in tree_keys:
+                self.msf.delete_edge(*key)
+        for in_tree in (False, True):
+            for key, successor in changed.items():
+                if successor is not None and (key in tree_keys) == in_tree:
+                    # a heavier edge takes over the pair, in place unless minimality breaks
+                    self.msf.update_weight(key[0], key[1], successor[3])
+        for key, successor in changed.items():
+            if successor is None and key in tree_keys:
+                self.msf.delete_edge(*key)
+        return len(expiring)
+
+    def connected(self, u, v):
+        return self.msf.connected(u, v)
+
+    def path_max(self, u, v):
+        return self.msf.path_max(u, v)
+
+    def forest_edges(self):
+        return self.msf.forest_edges()
+
+    def forest_weight(self):
+        return self.msf.forest_weight()
+
+    def stats(self):
+        return {
+            'now': self.now,
+            'live_edges': len(self.arrivals),
+            'live_pairs': len(self.pairs),
+            'forest_edges': len(self.msf.tree_edges),
+            'arrived': self.arrived,
+            'expired': self.expired,
+        }
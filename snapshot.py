@@ -0,0 +1,140 @@
+"""
+Read-mostly top tree: a pool of reader threads answers path_max and connected
+queries on a stable version while one writer prepares the next.
+
+SnapshotTree keeps two replicas of the same forest (the left-right technique).
+Readers always use the read replica; the writer applies its links and cuts to
+the other one and logs them. publish() makes the written replica the read
+replica and bumps the epoch, waits until the readers that were still on the old
+replica leave, and replays the log on it, so that both replicas hold the new
+version again. Readers never block the writer's batch and never see a half
+applied batch; every answer carries the epoch it was computed at.
+
+Queries on a Tree do not write to it (expose keeps its marks per call) once
+its pending write-back updates are applied, and Tree.flush applies them under
+a lock, so any number of readers can share a replica.
+
+    forest = SnapshotTree()
+    forest.insert_edge(1, 2, 5)
+    forest.insert_edge(2, 3, 7)
+    forest.publish()
+    with ThreadPoolExecutor(8) as pool:
+        answers = forest.query_many([('path_max', 1, 3), ('connected', 1, 4)], pool)
+"""
+import threading
+from contextlib import contextmanager
+
+from toptree import Tree
+
+
+class SnapshotTree:
+
+    def __init__(self, path_cache_size=0, top_k=0, write_back=4096):
+        # both replicas buffer the writer's updates and apply them as one update on publish
+        self.trees = [Tree(path_cache_size, top_k, write_back), Tree(path_cache_size, top_k, write_back)]
+        # per replica: (u, v) with u < v -> leaf cluster of the edge
+        self.leaves = [{}, {}]
+        self.read_index = 0
+        self.epoch = 0
+        self.readers = [0, 0]
+        self.log = []
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+
+    @staticmethod
+    def _key(u, v):
+        return (u, v) if u < v else (v, u)
+
+    @property
+    def write_tree(self) -> Tree:
+        # the replica the writer owns until the next publish; only the writer thread may touch it
+        return self.trees[1 - self.read_index]
+
+    def _apply(self, index, op):
+        kind, u, v, w = op
+        if kind == 'link':
+            self.leaves[index][self._key(u, v)] = self.trees[index].link(u, v, w)
+        else:
+            self.trees[index].cut(self.leaves[index].pop(self._key(u, v)))
+
+    def _write(self, op):
+        self._apply(1 - self.read_index, op)
+        self.log.append(op)
+
+    def link(self, u, v, w):
+        if self._key(u, v) in self.leaves[1 - self.read_index]:
+            raise ValueError(f"Edge ({u}, {v}) is already in the forest")
+        self._write(('link', u, v, w))
+
+    def cut(self, u, v):
+        if self._key(u, v) not in self.leaves[1 - self.read_index]:
+            raise KeyError(f"Edge ({u}, {v}) is not in the forest")
+        self._write(('cut', u, v, None))
+
+    def insert_edge(self, u, v, w):
+        # minimum spanning forest insertion as in algorithms.py, decided on the write replica
+        if u == v:
+            return False
+        C = self.write_tree.expose(u, v)
+        if C is None:
+            self.link(u, v, w)
+            return True
+        if C.data.max_cost > w:
+            leaf = C.data.ptr
+            self.cut(leaf.arc1.head.name, leaf.arc2.head.name)
+            self.link(u, v, w)
+            return True
+        return False
+
+    def publish(self):
+        # make the writer's version visible, returns its epoch
+        written = 1 - self.read_index
+        self.trees[written].flush()
+        with self._lock:
+            self.read_index = written
+            self.epoch += 1
+            epoch = self.epoch
+            while self.readers[1 - written]:
+                self._drained.wait()
+        stale = 1 - written
+        for op in self.log:
+            self._apply(stale, op)
+        self.trees[stale].flush()
+        self.log = []
+        return epoch
+
+    @contextmanager
+    def reader(self):
+        # (epoch, tree) of the current version; the tree must only be queried inside the block
+        with self._lock:
+            index = self.read_index
+            self.readers[index] += 1
+            epoch = self.epoch
+        try:
+            yield epoch, self.trees[index]
+        finally:
+            with self._lock:
+                self.readers[index] -= 1
+                if not self.readers[index]:
+                    self._drained.notify_all()
+
+    def path_max(self, u, v):
+        # (epoch, weight of the heaviest edge on the path, or None)
+        with self.reader() as (epoch, tree):
+            data = tree.path_max(u, v)
+            return epoch, None if data is None else data.max_cost
+
+    def connected(self, u, v):
+        with self.reader() as (epoch, tree):
+            return epoch, tree.connected(u, v)
+
+    def query_many(self, queries, executor=None):
+        # Answer (op, u, v) queries, op being 'path_max' or 'connected', as (epoch, result) in
+        # order. With an executor the queries are spread over its threads, otherwise they run here.
+        ops = {'path_max': self.path_max, 'connected': self.connected}
+        for op, _, _ in queries:
+            if op not in ops:
+                raise ValueError(f"Unknown query {op!r}")
+        if executor is None:
+            return [ops[op](u, v) for op, u, v in queries]
+        return list(executor.map(lambda query: ops[query[0]](query[1], query[2]), queries))
@@ -0,0 +1,92 @@
+import os
+import random
+import tempfile
+import unittest
+from kruskal import BatchKruskal, kruskal_minimum_spanning_forest
+from naive import DynamicMST
+from parser import EdgeList, parse_dimacs_edges
+
+
+class TestParser(unittest.TestCase):
+    def test_parse_dimacs_edges(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.max', delete=False) as f:
+            f.write("c comment\np max 4 6\nn 1 s\nn 4 t\na 1 2 5\na 2 1 3\na 2 3 7\na 3 3 1\na 3 4 2\na 4 3 9\n")
+        try:
+            edges = parse_dimacs_edges(f.name)
+        finally:
+            os.unlink(f.name)
+        self.assertEqual(edges.num_vertices, 4)
+        self.assertEqual(list(edges), [(1, 2, 5), (2, 3, 7), (3, 4, 2)])
+        self.assertEqual(edges[1], (2, 3, 7))
+        self.assertEqual(len(edges), 3)
+
+    def test_parse_rejects_arcs_it_cannot_key(self):
+        for text in ("a 1 2 5\np max 4 1\n", "p max 4 2\na 1 2 5\na 2 7 1\n"):
+            with tempfile.NamedTemporaryFile('w', suffix='.max', delete=False) as f:
+                f.write(text)
+            try:
+                with self.assertRaises(ValueError):
+                    parse_dimacs_edges(f.name)
+            finally:
+                os.unlink(f.name)
+
+    def test_edge_list_is_compact(self):
+        edges = EdgeList(1000)
+        for i in range(1, 1000):
+            edges.append(i, i + 1, i % 7)
+        self.assertEqual(edges.nbytes(), 999 * (4 + 4 + 8))
+
+
+class TestKruskal(unittest.TestCase):
+    def test_edge_list_matches_tuples(self):
+        rng = random.Random(3)
+        edges = EdgeList(200)
+        for _ in range(1000):
+            u, v = rng.sample(range(1, 201), 2)
+            edges.append(u, v, rng.randint(1, 50))
+        forest = kruskal_minimum_spanning_forest(edges)
+        self.assertEqual(sum(c for *_, c in forest), sum(c for *_, c in kruskal_minimum_spanning_forest(list(edges))))
+        self.assertEqual(sum(c for *_, c in forest), sum(c for *_, c in kruskal_minimum_spanning_forest(iter(edges))))
+
+    def test_long_path(self):
+        n = 20000
+        forest = kruskal_minimum_spanning_forest([(i, i + 1, 1) for i in range(n)])
+        self.assertEqual(len(forest), n)
+
+
+class TestBatchKruskal(unittest.TestCase):
+    def test_batches_match_offline(self):
+        rng = random.Random(11)
+        batches = BatchKruskal()
+        edges = []
+        for _ in range(15):
+            batch = [(*rng.sample(range(100), 2), rng.randint(1, 40)) for _ in range(rng.randint(0, 80))]
+            edges += batch
+            forest = batches.insert_batch(batch)
+            self.assertEqual(sum(c for *_, c in forest), sum(c for *_, c in kruskal_minimum_spanning_forest(edges)))
+            self.assertEqual([c for *_, c in forest], sorted(c for *_, c in forest))
+        self.assertEqual(len(batches), len(kruskal_minimum_spanning_forest(edges)))
+
+    def test_forest_edges_win_ties(self):
+        batches = BatchKruskal([(1, 2, 5), (2, 3, 1)])
+        self.assertEqual(batches.insert_batch([(1, 3, 5), (3, 4, 2)]), [(2, 3, 1), (3, 4, 2), (1, 2, 5)])
+        self.assertEqual(batches.insert_batch([(1, 3, 4)]), [(2, 3, 1), (3, 4, 2), (1, 3, 4)])
+
+
+class TestNaive(unittest.TestCase):
+    def test_find_path_deeper_than_recursion_limit(self):
+        n = 2000
+        mst = DynamicMST()
+        for i in range(n):
+            mst.add_edge(i, i + 1, i)
+        path = mst.find_path(0, n)
+        self.assertEqual(len(path), n)
+        self.assertEqual(path[0], (0, 1, 0))
+        self.assertEqual(path[-1], (n - 1, n, n - 1))
+        self.assertTrue(mst.add_edge(0, n, 10))
+        self.assertNotIn((n - 1, n, n - 1), mst.get_mst_edges())
+        self.assertEqual(mst.find_path(0, n), [(0, n, 10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
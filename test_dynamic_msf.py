@@ -0,0 +1,99 @@
+import random
+import unittest
+from dynamic_msf import DynamicMSF
+from kruskal import kruskal_minimum_spanning_forest
+
+
+class TestDynamicMSF(unittest.TestCase):
+    def test_insert_keeps_lighter_edge(self):
+        msf = DynamicMSF()
+        self.assertTrue(msf.insert_edge(1, 2, 5))
+        self.assertTrue(msf.insert_edge(2, 3, 7))
+        self.assertTrue(msf.insert_edge(1, 3, 2))
+        self.assertTrue(msf.insert_edge(3, 4, 9))
+        self.assertFalse(msf.insert_edge(2, 4, 10))
+        self.assertFalse(msf.is_tree_edge(2, 3))
+        self.assertEqual(msf.forest_weight(), 5 + 2 + 9)
+
+    def test_delete_finds_lightest_replacement(self):
+        msf = DynamicMSF()
+        for u, v, w in [(1, 2, 1), (2, 3, 1), (3, 4, 1), (1, 4, 8), (2, 4, 5), (1, 3, 6)]:
+            msf.insert_edge(u, v, w)
+        a, b, w = msf.delete_edge(2, 3)
+        self.assertEqual(({a, b}, w), ({2, 4}, 5))
+        self.assertTrue(msf.is_tree_edge(2, 4))
+        self.assertIsNone(msf.delete_edge(1, 4))
+        self.assertEqual(msf.forest_weight(), 1 + 1 + 5)
+
+    def test_delete_disconnects_without_replacement(self):
+        msf = DynamicMSF()
+        msf.insert_edge(1, 2, 3)
+        msf.insert_edge(2, 3, 4)
+        self.assertIsNone(msf.delete_edge(1, 2))
+        self.assertFalse(msf.connected(1, 2))
+        with self.assertRaises(KeyError):
+            msf.delete_edge(1, 2)
+
+    def test_update_weight(self):
+        msf = DynamicMSF()
+        for u, v, w in [(1, 2, 1), (2, 3, 2), (3, 4, 3), (1, 4, 10), (1, 3, 6)]:
+            msf.insert_edge(u, v, w)
+        # a lighter forest edge is updated in place
+        cluster = msf.tree_edges[(3, 4)]
+        self.assertTrue(msf.update_weight(3, 4, 2))
+        self.assertIs(msf.tree_edges[(3, 4)], cluster)
+        # a heavier one stays in the forest when no lighter edge can replace it
+        self.assertTrue(msf.update_weight(2, 3, 5))
+        self.assertTrue(msf.is_tree_edge(2, 3))
+        self.assertEqual(msf.path_max(1, 4).max_cost, 5)
+        self.assertFalse(msf.update_weight(2, 3, 7))
+        self.assertTrue(msf.is_tree_edge(1, 3))
+        self.assertTrue(msf.update_weight(1, 4, 2))
+        self.assertFalse(msf.is_tree_edge(1, 3))
+        self.assertEqual(msf.forest_weight(), 1 + 2 + 2)
+
+    def test_cut_moves_smaller_half_up(self):
+        msf = DynamicMSF()
+        for i in range(1, 16):
+            msf.insert_edge(i - 1, i, 1)
+        msf.insert_edge(0, 15, 100)
+        msf.insert_edge(2, 5, 50)
+        a, b, w = msf.delete_edge(11, 12)
+        self.assertEqual(({a, b}, w), ({0, 15}, 100))
+        # the four vertices past the cut went up to level 1 with their tree edges
+        self.assertEqual([msf.level_of[(i, i + 1)] for i in range(12, 15)], [1, 1, 1])
+        self.assertEqual(msf.level_of[(10, 11)], 0)
+        self.assertEqual(msf.levels[1].forest.component_summary(12).vertices, 4)
+        a, b, w = msf.delete_edge(3, 4)
+        self.assertEqual(({a, b}, w), ({2, 5}, 50))
+        self.assertEqual(msf.level_of[(2, 5)], 0)
+        self.assertEqual(msf.forest_weight(), 13 + 100 + 50)
+        self.assertIsNone(msf.delete_edge(0, 15))
+        self.assertFalse(msf.connected(0, 15))
+
+    def test_random_updates_match_kruskal(self):
+        rng = random.Random(7)
+        msf = DynamicMSF()
+        live = {}
+        for _ in range(400):
+            if live and rng.random() < 0.4:
+                u, v = rng.choice(list(live))
+                del live[(u, v)]
+                msf.delete_edge(u, v)
+            elif live and rng.random() < 0.3:
+                u, v = rng.choice(list(live))
+                live[(u, v)] = rng.randint(1, 100)
+                msf.update_weight(u, v, live[(u, v)])
+            else:
+                u, v = rng.sample(range(30), 2)
+                if (u, v) in msf:
+                    continue
+                live[(u, v)] = rng.randint(1, 100)
+                msf.insert_edge(u, v, live[(u, v)])
+            expected = kruskal_minimum_spanning_forest([(u, v, w) for (u, v), w in live.items()])
+            self.assertEqual(msf.forest_weight(), sum(w for _, _, w in expected))
+            self.assertEqual(len(msf.tree_edges), len(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import random
+import tempfile
+import unittest
+from engine_selector import AdaptiveMSF, CostModel, ENGINES, calibrate, make_engine
+from kruskal import kruskal_minimum_spanning_forest
+
+
+def random_edges(rng, n, m):
+    return [(*rng.sample(range(n), 2), rng.randint(1, 100)) for _ in range(m)]
+
+
+class TestEngines(unittest.TestCase):
+    def test_engines_agree(self):
+        rng = random.Random(5)
+        edges = random_edges(rng, 60, 300)
+        expected = sum(w for *_, w in kruskal_minimum_spanning_forest(edges))
+        pairs = [tuple(rng.sample(range(60), 2)) for _ in range(40)] + [(3, 3), (1, 1000)]
+        answers = {}
+        for name in ENGINES:
+            msf = AdaptiveMSF(engine=name)
+            for i in range(0, len(edges), 25):
+                msf.insert_batch(edges[i:i + 25])
+            self.assertEqual(msf.forest_weight(), expected, name)
+            self.assertEqual(len(msf.forest_edges()), 59, name)
+            answers[name] = [(msf.connected(u, v), msf.path_max(u, v)) for u, v in pairs]
+            self.assertEqual(msf.engine_counts(), {name: 12})
+        for name in ENGINES:
+            self.assertEqual(answers[name], answers['toptree'], name)
+        self.assertEqual(answers['toptree'][-2:], [(True, None), (False, None)])
+
+    def test_make_engine_from_forest(self):
+        rng = random.Random(6)
+        forest = kruskal_minimum_spanning_forest(random_edges(rng, 40, 120))
+        pairs = [tuple(rng.sample(range(40), 2)) for _ in range(20)]
+        answers = {}
+        for name in ENGINES:
+            engine = make_engine(name, forest, recompute_period=8)
+            self.assertEqual({(min(u, v), max(u, v), w) for u, v, w in engine.forest()},
+                             {(min(u, v), max(u, v), w) for u, v, w in forest}, name)
+            answers[name] = [(engine.connected(u, v), engine.path_max(u, v)) for u, v in pairs]
+        for name in ENGINES:
+            self.assertEqual(answers[name], answers['toptree'], name)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            AdaptiveMSF(engine='dijkstra')
+
+
+class TestCostModel(unittest.TestCase):
+    def test_choice_follows_workload(self):
+        model = CostModel()
+        self.assertIn(model.choose(10 ** 6, 10 ** 6, 0)[0], ('kruskal', 'recompute'))
+        self.assertEqual(model.choose(10 ** 6, 1, 50, 'toptree')[0], 'toptree')
+        self.assertEqual(model.choose(20, 1, 5, 'naive')[0], 'naive')
+        # a rebuild is only worth it when the batch pays for it
+        self.assertEqual(model.choose(10 ** 6, 1, 1, 'naive')[0], 'naive')
+
+    def test_save_load(self):
+        model = CostModel(recompute_period=100)
+        model.coefficients['toptree']['insert'] = 1.0
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'costs.json')
+            model.save(path)
+            self.assertEqual(CostModel.load(path), model)
+
+    def test_calibrate(self):
+        edges = random_edges(random.Random(1), 40, 200)
+        model = calibrate(edges, batch_size=20)
+        for name in ENGINES:
+            self.assertTrue(all(c > 0 for c in model.coefficients[name].values()), name)
+        self.assertEqual(model.coefficients['recompute'], model.coefficients['kruskal'])
+
+
+class TestAdaptiveMSF(unittest.TestCase):
+    def test_switches_and_reports(self):
+        rng = random.Random(9)
+        msf = AdaptiveMSF()
+        edges = []
+        # a trickle with queries, then one large batch without any
+        for _ in range(30):
+            batch = random_edges(rng, 300, 2)
+            edges += batch
+            msf.insert_batch(batch)
+            for _ in range(3):
+                msf.path_max(*rng.sample(range(300), 2))
+        batch = random_edges(rng, 300, 3000)
+        edges += batch
+        report = msf.insert_batch(batch)
+        self.assertEqual(len(msf.reports), 31)
+        self.assertEqual(msf.reports[29].engine, 'naive')
+        self.assertIn(report.engine, ('kruskal', 'recompute'))
+        self.assertIsNotNone(report.switched_from)
+        self.assertEqual(report.edges, 3000)
+        self.assertEqual(msf.forest_weight(), sum(w for *_, w in kruskal_minimum_spanning_forest(edges)))
+        self.assertEqual(sum(msf.engine_counts().values()), 31)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import unittest
+from server import BatchingServer
+from kruskal import kruskal_minimum_spanning_forest
+
+
+class TestApplyBatch(unittest.TestCase):
+    def test_insert_and_query(self):
+        server = BatchingServer()
+        results = server.apply_batch([
+            {'op': 'insert_edge', 'u': 1, 'v': 2, 'w': 5},
+            {'op': 'insert_edge', 'u': 2, 'v': 3, 'w': 7},
+            {'op': 'connected', 'u': 1, 'v': 3},
+            {'op': 'path_max', 'u': 1, 'v': 3},
+            {'op': 'insert_edge', 'u': 1, 'v': 3, 'w': 2},
+            {'op': 'path_max', 'u': 1, 'v': 3},
+            {'op': 'connected', 'u': 1, 'v': 4},
+        ])
+        self.assertEqual(results[0], {'result': True})
+        self.assertEqual(results[1], {'result': True})
+        self.assertEqual(results[2], {'result': True})
+        self.assertEqual(results[3]['result']['weight'], 7)
+        self.assertEqual(results[4], {'result': True})
+        self.assertEqual(results[5]['result']['weight'], 2)
+        self.assertEqual(results[6], {'result': False})
+
+    def test_coalesced_batch_matches_kruskal(self):
+        edges = [(i, (i * 7 + 3) % 40, (i * 13) % 17 + 1) for i in range(40)]
+        edges = [(u, v, w) for u, v, w in edges if u != v]
+        server = BatchingServer()
+        server.apply_batch([{'op': 'insert_edge', 'u': u, 'v': v, 'w': w} for u, v, w in edges])
+        total = sum(a.cluster.data.max_cost for r in server.tree.roots for a in r.get_levels()[-1])
+        self.assertEqual(total, sum(w for _, _, w in kruskal_minimum_spanning_forest(edges)))
+
+    def test_unknown_op(self):
+        server = BatchingServer()
+        self.assertIn('error', server.apply_batch([{'op': 'frobnicate'}])[0])
+
+    def test_rejects_bad_input(self):
+        server = BatchingServer()
+        results = server.apply_batch([
+            {'op': 'insert_edge', 'u': 3, 'v': 4, 'w': '5'},
+            {'op': 'insert_edge', 'u': 3, 'v': 4, 'w': None},
+            {'op': 'insert_edge', 'u': 3, 'v': 4, 'w': True},
+            {'op': 'insert_edge', 'u': [3], 'v': 4, 'w': 1},
+            {'op': 'insert_edge', 'u': 1, 'v': 2, 'w': 1},
+            {'op': 'insert_edge', 'u': 2, 'v': 3, 'w': 2.5},
+            {'op': 'path_max', 'u': {}, 'v': 3},
+            {'op': 'path_max', 'u': 1, 'v': 3},
+        ])
+        for result in results[:4] + results[6:7]:
+            self.assertIn('error', result)
+        self.assertEqual(results[4:6], [{'result': True}, {'result': True}])
+        self.assertEqual(results[7]['result']['weight'], 2.5)
+        self.assertEqual(server.tree.component_summary(3).vertices, 3)
+
+
+class TestSocket(unittest.TestCase):
+    def test_round_trip(self):
+        async def run():
+            service = BatchingServer(max_batch_size=8, max_batch_delay=0.001)
+            server = await service.start_tcp('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            requests = [
+                {'id': 1, 'op': 'insert_edge', 'u': 1, 'v': 2, 'w': 4},
+                {'id': 2, 'op': 'insert_edge', 'u': 2, 'v': 3, 'w': 9},
+                {'id': 3, 'op': 'path_max', 'u': 1, 'v': 3},
+                {'id': 4, 'op': 'stats'},
+            ]
+            for request in requests:
+                writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            replies = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            await service.close()
+            return replies
+
+        replies = asyncio.run(run())
+        self.assertEqual([r['id'] for r in replies], [1, 2, 3, 4])
+        self.assertEqual(replies[2]['result'], {'weight': 9, 'edge': [2, 3]})
+        self.assertIn('throughput', replies[3]['result'])
+        self.assertIn('queue_depth', replies[3]['result'])
+
+    def test_bad_weight_does_not_stop_service(self):
+        async def run():
+            service = BatchingServer(max_batch_size=8, max_batch_delay=0.001)
+            server = await service.start_tcp('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for request in [{'id': 1, 'op': 'insert_edge', 'u': 3, 'v': 4, 'w': '5'},
+                            {'id': 2, 'op': 'insert_edge', 'u': 5, 'v': 6, 'w': 1}]:
+                writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            first = [json.loads(await reader.readline()) for _ in range(2)]
+            writer.close()
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(json.dumps({'id': 3, 'op': 'connected', 'u': 5, 'v': 6}).encode() + b'\n')
+            await writer.drain()
+            second = json.loads(await asyncio.wait_for(reader.readline(), 5))
+            writer.close()
+            await service.close()
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertIn('error', first[0])
+        self.assertEqual(first[1], {'id': 2, 'result': True})
+        self.assertEqual(second, {'id': 3, 'result': True})
+
+    def test_batch_failure_is_contained(self):
+        async def run():
+            service = BatchingServer(max_batch_size=1, max_batch_delay=0.001)
+            apply_batch = service.apply_batch
+            def flaky(requests):
+                if requests[0].get('u') == 99:
+                    raise RuntimeError('boom')
+                return apply_batch(requests)
+            service.apply_batch = flaky
+            server = await service.start_tcp('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for request in [{'id': 1, 'op': 'connected', 'u': 99, 'v': 1},
+                            {'id': 2, 'op': 'connected', 'u': 1, 'v': 1}]:
+                writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            replies = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(2)]
+            writer.close()
+            await service.close()
+            return replies
+
+        replies = asyncio.run(run())
+        self.assertIn('internal error', replies[0]['error'])
+        self.assertEqual(replies[1], {'id': 2, 'result': True})
+
+    def test_close_with_client_connected(self):
+        async def run():
+            # a long batch delay keeps the request waiting in the batcher when close() runs
+            service = BatchingServer(max_batch_size=64, max_batch_delay=60)
+            server = await service.start_tcp('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(json.dumps({'id': 1, 'op': 'connected', 'u': 1, 'v': 2}).encode() + b'\n')
+            await writer.drain()
+            await asyncio.sleep(0.05)
+            await asyncio.wait_for(service.close(), 5)
+            reply = json.loads(await asyncio.wait_for(reader.readline(), 5))
+            eof = await asyncio.wait_for(reader.readline(), 5)
+            writer.close()
+            return reply, eof
+
+        with self.assertNoLogs('asyncio', level='ERROR'):
+            reply, eof = asyncio.run(run())
+        self.assertEqual(reply, {'id': 1, 'error': 'server is shutting down'})
+        self.assertEqual(eof, b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
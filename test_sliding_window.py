@@ -0,0 +1,77 @@
+import random
+import unittest
+from sliding_window import SlidingWindowMSF
+from kruskal import kruskal_minimum_spanning_forest
+
+
+class TestSlidingWindowMSF(unittest.TestCase):
+    def test_expiry_restores_replacement(self):
+        window = SlidingWindowMSF(10)
+        window.add_edge(1, 2, 1, 0)
+        window.add_edge(2, 3, 1, 1)
+        window.add_edge(1, 3, 5, 5)
+        self.assertEqual(window.forest_weight(), 2)
+        window.advance(10)
+        self.assertEqual(window.forest_weight(), 6)
+        window.advance(11)
+        self.assertEqual(window.forest_edges(), [(1, 3, 5)])
+        window.advance(15)
+        self.assertEqual(window.forest_edges(), [])
+        self.assertEqual(len(window), 0)
+
+    def test_parallel_edges_on_one_pair(self):
+        window = SlidingWindowMSF(10)
+        window.add_edges([(1, 2, 3, 0), (2, 1, 7, 1), (1, 2, 5, 2)])
+        self.assertEqual(window.forest_weight(), 3)
+        window.advance(10)
+        self.assertEqual(window.forest_weight(), 5)
+        window.add_edge(1, 2, 1, 11)
+        window.advance(20)
+        self.assertEqual(window.forest_weight(), 1)
+        self.assertEqual(window.stats()['live_pairs'], 1)
+
+    def test_replacement_sees_weights_of_the_same_batch(self):
+        window = SlidingWindowMSF(10)
+        window.add_edges([(1, 2, 1, 0), (1, 3, 2, 0), (2, 3, 1, 1)])
+        window.add_edges([(1, 3, 9, 2), (2, 4, 1, 2), (1, 4, 5, 2)])
+        replacements = []
+        delete_edge = window.msf.delete_edge
+        window.msf.delete_edge = lambda u, v: replacements.append(delete_edge(u, v))
+        # (1, 2) and the lighter edge on (1, 3) expire together: the replacement for (1, 2) is
+        # chosen with (1, 3) already at 9
+        window.advance(10)
+        self.assertEqual([({a, b}, w) for a, b, w in replacements], [({1, 4}, 5)])
+        self.assertFalse(window.msf.is_tree_edge(1, 3))
+        self.assertEqual(window.forest_weight(), 1 + 1 + 5)
+
+    def test_out_of_order_rejected(self):
+        window = SlidingWindowMSF(5)
+        window.add_edge(1, 2, 1, 4)
+        with self.assertRaises(ValueError):
+            window.add_edge(2, 3, 1, 3)
+
+    def test_random_stream_matches_kruskal(self):
+        rng = random.Random(3)
+        window = SlidingWindowMSF(40)
+        stream = []
+        t = 0
+        for _ in range(60):
+            batch = []
+            for _ in range(rng.randint(0, 6)):
+                t += rng.randint(0, 2)
+                u, v = rng.sample(range(25), 2)
+                batch.append((u, v, rng.randint(1, 50), t))
+            stream.extend(batch)
+            window.add_edges(batch)
+            window.advance(t)
+            live = {}
+            for u, v, w, s in stream:
+                if s > t - 40:
+                    key = (min(u, v), max(u, v))
+                    live[key] = min(w, live.get(key, w))
+            expected = kruskal_minimum_spanning_forest([(u, v, w) for (u, v), w in live.items()])
+            self.assertEqual(window.forest_weight(), sum(w for _, _, w in expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
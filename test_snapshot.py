@@ -0,0 +1,132 @@
+import random
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from kruskal import kruskal_minimum_spanning_forest
+from snapshot import SnapshotTree
+from toptree import Tree
+
+
+class TestSnapshotTree(unittest.TestCase):
+    def test_writes_are_invisible_until_publish(self):
+        forest = SnapshotTree()
+        forest.link(1, 2, 5)
+        forest.link(2, 3, 7)
+        self.assertEqual(forest.connected(1, 3), (0, False))
+        self.assertEqual(forest.publish(), 1)
+        self.assertEqual(forest.path_max(1, 3), (1, 7))
+        forest.cut(2, 3)
+        self.assertEqual(forest.connected(1, 3), (1, True))
+        forest.publish()
+        self.assertEqual(forest.connected(1, 3), (2, False))
+        # both replicas hold the same forest after a publish
+        for tree in forest.trees:
+            self.assertFalse(tree.connected(1, 3))
+            self.assertEqual(tree.path_max(1, 2).max_cost, 5)
+        with self.assertRaises(KeyError):
+            forest.cut(2, 3)
+
+    def test_insert_edge_keeps_minimum_forest(self):
+        rng = random.Random(4)
+        forest = SnapshotTree(write_back=16)
+        edges = [(*rng.sample(range(50), 2), rng.randint(1, 30)) for _ in range(400)]
+        for i, (u, v, w) in enumerate(edges):
+            forest.insert_edge(u, v, w)
+            if i % 37 == 0:
+                forest.publish()
+        forest.publish()
+        expected = sum(w for *_, w in kruskal_minimum_spanning_forest(edges))
+        for index in (0, 1):
+            self.assertEqual(sum(leaf.data.max_cost for leaf in forest.leaves[index].values()), expected)
+
+    def test_readers_see_whole_epochs(self):
+        # epoch e holds the path 0 - 1 - ... - e with edge (i, i + 1) of weight i
+        forest = SnapshotTree(path_cache_size=64)
+        forest.link(0, 1, 0)
+        forest.publish()
+        stop = threading.Event()
+        errors = []
+
+        def read():
+            rng = random.Random()
+            while not stop.is_set():
+                with forest.reader() as (epoch, tree):
+                    x = rng.randint(1, epoch)
+                    if not tree.connected(0, x) or tree.connected(0, epoch + 1):
+                        errors.append(epoch)
+                    if tree.path_max(0, x).max_cost != x - 1:
+                        errors.append(epoch)
+
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(read) for _ in range(4)]
+            for i in range(1, 60):
+                forest.link(i, i + 1, i)
+                forest.publish()
+            stop.set()
+            for future in futures:
+                future.result()
+        self.assertEqual(errors, [])
+        self.assertEqual(forest.readers, [0, 0])
+
+    def test_query_many(self):
+        forest = SnapshotTree()
+        for u, v, w in [(1, 2, 4), (2, 3, 9), (3, 4, 1)]:
+            forest.insert_edge(u, v, w)
+        forest.publish()
+        queries = [('path_max', 1, 4), ('connected', 1, 5), ('path_max', 3, 4)]
+        expected = [(1, 9), (1, False), (1, 1)]
+        self.assertEqual(forest.query_many(queries), expected)
+        with ThreadPoolExecutor(3) as pool:
+            self.assertEqual(forest.query_many(queries, pool), expected)
+        with self.assertRaises(ValueError):
+            forest.query_many([('shortest_path', 1, 2)])
+
+
+class TestConcurrentExpose(unittest.TestCase):
+    def test_expose_does_not_touch_marks(self):
+        tree = Tree()
+        for i in range(1, 300):
+            tree.link(i, i // 2, i)
+        for cluster in tree.roots:
+            cluster.marked = True
+        self.assertEqual(tree.expose(150, 299).data.max_cost, 299)
+        stack = tree.roots
+        while stack:
+            cluster = stack.pop()
+            self.assertEqual(cluster.marked, cluster.par is None)
+            stack += [child for child in (cluster.left, cluster.right) if child is not None]
+
+    def test_parallel_readers_agree(self):
+        rng = random.Random(8)
+        tree = Tree()
+        for i in range(1, 500):
+            tree.link(i, rng.randrange(i), rng.randint(1, 1000))
+        pairs = [tuple(rng.sample(range(500), 2)) for _ in range(400)]
+        expected = [tree.path_max(u, v).max_cost for u, v in pairs]
+        with ThreadPoolExecutor(8) as pool:
+            got = list(pool.map(lambda p: tree.path_max(*p).max_cost, pairs))
+        self.assertEqual(got, expected)
+
+    def test_parallel_readers_share_one_flush(self):
+        rng = random.Random(9)
+        edges = [(i, rng.randrange(i), rng.randint(1, 1000)) for i in range(1, 2000)]
+        tree = Tree(write_back=len(edges) + 1)
+        for u, v, w in edges:
+            tree.link(u, v, w)
+        reference = Tree.from_forest(edges)
+        pairs = [tuple(rng.sample(range(2000), 2)) for _ in range(8)]
+        expected = [reference.path_max(u, v).max_cost for u, v in pairs]
+        # all readers find the links pending and query at once
+        start = threading.Barrier(len(pairs))
+
+        def query(pair):
+            start.wait()
+            return tree.path_max(*pair).max_cost
+
+        with ThreadPoolExecutor(len(pairs)) as pool:
+            got = list(pool.map(query, pairs))
+        self.assertEqual(got, expected)
+        self.assertEqual(tree.pending_updates, 0)
+
+if __name__ == '__main__':
+    unittest.main()
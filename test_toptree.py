@@ -1,5 +1,6 @@
+import random
 import unittest
-from toptree import Vertex, Arc, Cluster, ClusterType, Data, Tree
+from toptree import Vertex, Arc, Cluster, ClusterType, Data, Tree, ComponentSummary
 
 class TestVertex(unittest.TestCase):
     def test_vertex_creation(self):
@@ -132,6 +133,316 @@ class TestTree(unittest.TestCase):
         self.assertEqual(exposed.arc1.head.name, v1.name)
         self.assertEqual(exposed.arc2.head.name, v3.name)
 
+    def test_cut_inner_edge_of_path(self):
+        tree = Tree()
+        v = [Vertex(i) for i in range(4)]
+        tree.link(v[1], v[2], 5)
+        tree.link(v[3], v[0], 6)
+        middle = tree.link(v[1], v[0], 7)
+
+        tree.cut(middle)
+        self.assertEqual(len(tree.roots), 2)
+        self.assertFalse(tree.connected(v[1], v[0]))
+        self.assertEqual(tree.path_max(v[3], v[0]).max_cost, 6)
+
+    def test_relink_after_cut(self):
+        tree = Tree()
+        v = [Vertex(i) for i in range(4)]
+        tree.link(v[2], v[3], 5)
+        leaf = tree.link(v[3], v[1], 6)
+        tree.link(v[0], v[3], 7)
+        tree.cut(leaf)
+        tree.link(v[3], v[1], 6)
+
+        self.assertEqual(tree.path_max(v[3], v[0]).max_cost, 7)
+        self.assertEqual(tree.path_max(v[1], v[2]).max_cost, 6)
+
+    def test_link_many(self):
+        tree = Tree()
+        v = [Vertex(i) for i in range(6)]
+        clusters = tree.link_many([(v[0], v[1], 3), (v[1], v[2], 8), (v[3], v[4], 1), (v[2], v[5], 2)])
+        self.assertEqual(len(clusters), 4)
+        self.assertEqual(len(tree.roots), 2)
+        self.assertTrue(tree.connected(v[0], v[5]))
+        self.assertFalse(tree.connected(v[0], v[4]))
+        self.assertEqual(tree.path_max(v[0], v[5]).max_cost, 8)
+        self.assertIs(tree.path_max(v[0], v[5]).ptr, clusters[1])
+        self.assertIsNone(tree.path_max(v[0], v[3]))
+
+    def test_from_forest(self):
+        v = [Vertex(i) for i in range(8)]
+        edges = [(v[0], v[1], 4), (v[1], v[2], 9), (v[1], v[3], 2), (v[3], v[4], 6), (v[5], v[6], 1)]
+        tree = Tree.from_forest(edges)
+        self.assertEqual(len(tree.roots), 2)
+        self.assertEqual(tree.path_max(v[2], v[4]).max_cost, 9)
+        self.assertEqual(tree.path_max(v[0], v[4]).max_cost, 6)
+        self.assertFalse(tree.connected(v[0], v[5]))
+
+        tree.cut(tree.path_max(v[2], v[4]).ptr)
+        tree.link(v[4], v[5], 3)
+        tree.link(v[6], v[7], 8)
+        self.assertFalse(tree.connected(v[2], v[4]))
+        self.assertEqual(tree.path_max(v[0], v[7]).max_cost, 8)
+        self.assertEqual(tree.path_max(v[0], v[5]).max_cost, 6)
+
+    def test_integer_vertex_ids(self):
+        tree = Tree()
+        leaf = tree.link(1, 2, 5)
+        tree.link(2, 3, 7)
+        tree.link_many([(3, 4, 1), (10, 11, 2)])
+        self.assertIs(tree.vertex(1), leaf.arc1.head)
+        self.assertEqual(len(tree.vertices), 6)
+        self.assertTrue(tree.connected(1, 4))
+        self.assertFalse(tree.connected(1, 10))
+        self.assertFalse(tree.connected(1, 99))
+        self.assertEqual(tree.path_max(1, 4).max_cost, 7)
+        self.assertEqual(tree.expose(4, 1).data.max_cost, 7)
+        self.assertIsNone(tree.path_max(1, 99))
+        self.assertEqual(Tree.from_forest([(0, 1, 3), (1, 2, 4)]).path_max(0, 2).max_cost, 4)
+
+    def test_memory_report(self):
+        tree = Tree.from_forest([(i, i // 2, i) for i in range(1, 20)])
+        report = tree.memory_report()
+        self.assertEqual(report['objects']['Vertex'], 20)
+        self.assertEqual(report['objects']['LEAF'], 19)
+        self.assertEqual(report['objects']['Data'], 19)
+        self.assertEqual(report['levels'][0]['LEAF'], 19)
+        clusters = sum(report['objects'][t.name] for t in (ClusterType.LEAF, ClusterType.RAKE, ClusterType.COMPRESS, ClusterType.DUMMY))
+        self.assertEqual(report['objects']['Arc'], 2 * clusters)
+        self.assertEqual(sum(level['bytes'] for level in report['levels']),
+                         report['bytes']['Arc'] + sum(report['bytes'][t] for t in ('LEAF', 'RAKE', 'COMPRESS', 'DUMMY')))
+        self.assertGreater(report['total_bytes'], 0)
+        self.assertEqual(Tree().memory_report()['total_bytes'], Tree().memory_report()['index_bytes'])
+
+    def test_component_summary(self):
+        tree = Tree.from_forest([(0, 1, 4), (1, 2, 9), (1, 3, 2), (5, 6, 1)])
+        self.assertEqual(tree.component_summary(3), ComponentSummary(4, 3, 15, 9))
+        self.assertEqual(tree.component_summary(6), ComponentSummary(2, 1, 1, 1))
+        self.assertIsNone(tree.component_summary(42))
+
+        tree.cut(tree.path_max(0, 2).ptr)
+        tree.link(2, 5, 3)
+        self.assertEqual(tree.component_summary(0), ComponentSummary(3, 2, 6, 4))
+        self.assertEqual(tree.component_summary(6), ComponentSummary(3, 2, 4, 3))
+        tree.vertex(7)
+        self.assertEqual(tree.component_summary(7), ComponentSummary())
+
+    def test_update_weight_in_place(self):
+        edges = [(0, 1, 4), (1, 2, 9), (1, 3, 2), (3, 4, 6), (4, 5, 1)]
+        tree = Tree.from_forest(edges, path_cache_size=4)
+        root = tree.roots[0]
+        self.assertEqual(tree.path_max(2, 5).max_cost, 9)
+        heavy = tree.path_max(2, 5).ptr
+        tree.update_weight(heavy, 3)
+        self.assertIs(tree.roots[0], root)
+        self.assertEqual(tree.path_max(2, 5).max_cost, 6)
+        self.assertEqual(tree.path_max(0, 2).max_cost, 4)
+        self.assertEqual(tree.component_summary(0), ComponentSummary(6, 5, 16, 6))
+        tree.update_weight(tree.path_max(4, 5).ptr, 20)
+        self.assertEqual(tree.path_max(2, 5).max_cost, 20)
+        self.assertEqual(tree.component_summary(0).max_weight, 20)
+
+    def test_edge_keys(self):
+        edges = [(0, 1, 4), (1, 2, 9), (2, 3, 2), (3, 4, 6), (4, 5, 1), (7, 8, 3)]
+        tree = Tree()
+        leaves = dict(zip(((u, v) for u, v, _ in edges), tree.link_many(edges)))
+        self.assertIsNone(tree.min_key_edge(0))
+        tree.set_key(leaves[(3, 4)], 5)
+        tree.set_key(leaves[(0, 1)], 2)
+        tree.set_key(leaves[(7, 8)], 1)
+        self.assertIs(tree.min_key_edge(5), leaves[(0, 1)])
+        self.assertIs(tree.min_key_edge(8), leaves[(7, 8)])
+        tree.set_key(leaves[(0, 1)], None)
+        self.assertIs(tree.min_key_edge(0), leaves[(3, 4)])
+
+        tree.cut(leaves[(2, 3)])
+        self.assertIsNone(tree.min_key_edge(0))
+        self.assertIs(tree.min_key_edge(5), leaves[(3, 4)])
+        tree.link(2, 5, 7)
+        self.assertIs(tree.min_key_edge(0), leaves[(3, 4)])
+        self.assertIsNone(tree.min_key_edge(6))
+
+        self.assertIs(tree.incident_edge(0), leaves[(0, 1)])
+        self.assertIs(tree.incident_edge(3), leaves[(3, 4)])
+        tree.cut(leaves[(7, 8)])
+        self.assertIsNone(tree.incident_edge(7))
+        self.assertIsNone(tree.incident_edge(42))
+
+    def test_path_top_k(self):
+        edges = [(0, 1, 4), (1, 2, 9), (2, 3, 2), (3, 4, 6), (2, 5, 8), (5, 6, 7)]
+        tree = Tree.from_forest(edges, top_k=3)
+        self.assertEqual([w for w, _ in tree.path_top_k(0, 4, 3)], [9, 6, 4])
+        self.assertEqual([w for w, _ in tree.path_top_k(6, 4, 2)], [8, 7])
+        self.assertEqual([w for w, _ in tree.path_top_k(3, 4, 3)], [6])
+        weight, leaf = tree.path_top_k(0, 6, 1)[0]
+        self.assertEqual(weight, 9)
+        self.assertIs(leaf.data.ptr, leaf)
+
+        tree.update_weight(leaf, 1)
+        tree.cut(tree.path_top_k(2, 5, 1)[0][1])
+        tree.link(4, 5, 3)
+        self.assertEqual([w for w, _ in tree.path_top_k(0, 6, 3)], [7, 6, 4])
+        with self.assertRaises(ValueError):
+            tree.path_top_k(0, 6, 4)
+        with self.assertRaises(ValueError):
+            tree.path_top_k(0, 6, -1)
+        self.assertEqual(tree.path_top_k(0, 6, 0), [])
+        # a disconnected pair has no path for any k, a vertex has an empty one to itself
+        tree.link(7, 8, 1)
+        for k in range(4):
+            self.assertIsNone(tree.path_top_k(0, 8, k))
+            self.assertIsNone(tree.path_top_k(0, 42, k))
+            self.assertEqual(tree.path_top_k(3, 3, k), [])
+
+        plain = Tree.from_forest([(1, 2, 5), (2, 3, 7)])
+        self.assertEqual(plain.path_top_k(1, 3, 0), [])
+        with self.assertRaises(ValueError):
+            plain.path_top_k(1, 3, -1)
+
+    def test_expose_set(self):
+        edges = [(0, 1, 4), (1, 2, 9), (2, 3, 2), (3, 4, 6), (2, 5, 8), (5, 6, 7), (6, 7, 1), (8, 9, 3)]
+        tree = Tree.from_forest(edges)
+        virtual = tree.expose_set([0, 4, 6])
+        got = sorted((min(a.name, b.name), max(a.name, b.name), data.max_cost) for a, b, data in virtual)
+        self.assertEqual(got, [(0, 2, 9), (2, 4, 6), (2, 6, 8)])
+        virtual = tree.expose_set([0, 1, 4])
+        got = sorted((min(a.name, b.name), max(a.name, b.name), data.max_cost) for a, b, data in virtual)
+        self.assertEqual(got, [(0, 1, 4), (1, 4, 9)])
+        self.assertIsNone(tree.expose_set([0, 9]))
+        self.assertEqual(tree.expose_set([3, 3]), [])
+
+    def test_mixed_int_and_vertex_arguments(self):
+        tree = Tree()
+        tree.link(1, 2, 5)
+        tree.link(Vertex(2), Vertex(3), 1)
+        tree.link(3, Vertex(4), 7)
+        self.assertEqual(len(tree.vertices), 4)
+        self.assertIs(tree.vertex(Vertex(2)), tree.vertex(2))
+        self.assertTrue(tree.connected(1, 3))
+        self.assertTrue(tree.connected(Vertex(1), 4))
+        self.assertEqual(len(tree.roots), 1)
+        self.assertEqual(tree.path_max(Vertex(1), 3).max_cost, 5)
+        self.assertEqual(tree.path_max(2, Vertex(4)).max_cost, 7)
+        self.assertIsNone(tree.expose(Vertex(1), Vertex(9)))
+
+    def test_from_forest_rejects_cycle(self):
+        v = [Vertex(i) for i in range(3)]
+        with self.assertRaises(ValueError):
+            Tree.from_forest([(v[0], v[1], 1), (v[1], v[2], 1), (v[2], v[0], 1)])
+
+
+class TestPathCache(unittest.TestCase):
+    def test_repeated_query_hits(self):
+        tree = Tree(path_cache_size=4)
+        v = [Vertex(i) for i in range(3)]
+        tree.link(v[0], v[1], 5)
+        tree.link(v[1], v[2], 7)
+        first = tree.expose(v[0], v[2])
+        self.assertIs(tree.expose(v[0], v[2]), first)
+        stats = tree.cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_reversed_pair_hits(self):
+        tree = Tree(path_cache_size=4)
+        tree.link(1, 2, 5)
+        tree.link(2, 'x', 7)
+        first = tree.expose(1, 'x')
+        self.assertIs(tree.expose('x', 1), first)
+        self.assertEqual(tree.cache_stats()['hits'], 1)
+        self.assertEqual(tree.cache_stats()['size'], 1)
+
+    def test_update_invalidates_only_its_component(self):
+        tree = Tree(path_cache_size=4)
+        v = [Vertex(i) for i in range(7)]
+        tree.link(v[0], v[1], 5)
+        tree.link(v[1], v[2], 7)
+        tree.link(v[3], v[4], 2)
+        tree.link(v[4], v[5], 1)
+        tree.expose(v[0], v[2])
+        tree.expose(v[3], v[5])
+
+        tree.link(v[5], v[6], 9)
+        self.assertEqual(tree.expose(v[0], v[2]).data.max_cost, 7)
+        self.assertEqual(tree.cache_stats()['hits'], 1)
+        self.assertEqual(tree.expose(v[3], v[5]).data.max_cost, 2)
+        self.assertEqual(tree.cache_stats()['invalidations'], 1)
+
+        leaf = tree.expose(v[3], v[6]).data.ptr
+        tree.cut(leaf)
+        self.assertIsNone(tree.expose(v[3], v[6]))
+        self.assertEqual(tree.expose(v[3], v[5]).data.max_cost, 2)
+
+    def test_lru_eviction(self):
+        tree = Tree(path_cache_size=2)
+        v = [Vertex(i) for i in range(4)]
+        tree.link(v[0], v[1], 1)
+        tree.link(v[1], v[2], 2)
+        tree.link(v[2], v[3], 3)
+        tree.expose(v[0], v[2])
+        tree.expose(v[0], v[3])
+        tree.expose(v[0], v[2])
+        tree.expose(v[1], v[3])
+        self.assertEqual(tree.cache_stats()['evictions'], 1)
+        self.assertEqual(tree.cache_stats()['size'], 2)
+        tree.expose(v[0], v[2])
+        self.assertEqual(tree.cache_stats()['hits'], 2)
+
+
+class TestWriteBack(unittest.TestCase):
+    def test_updates_wait_for_a_query(self):
+        tree = Tree(write_back=100)
+        leaves = [tree.link(i, i + 1, i) for i in range(10)]
+        self.assertEqual(tree.pending_updates, 10)
+        tree.cut(leaves[4])
+        self.assertEqual(tree.pending_updates, 9)
+        self.assertEqual(tree.path_max(0, 4).max_cost, 3)
+        self.assertEqual(tree.pending_updates, 0)
+        self.assertFalse(tree.connected(0, 9))
+        self.assertEqual(tree.component_summary(9).vertices, 6)
+
+    def test_opposite_updates_cancel(self):
+        tree = Tree(write_back=100)
+        v = [tree.vertex(i) for i in range(4)]
+        a = tree.link(0, 1, 5)
+        b = tree.link(1, 2, 7)
+        tree.flush()
+        tree.cut(b)
+        self.assertIs(tree.link(2, 1, 7), b)
+        tree.cut(a)
+        self.assertIs(tree.link(0, 1, 2), a)
+        c = tree.link(2, 3, 1)
+        tree.cut(c)
+        self.assertEqual(tree.pending_updates, 0)
+        self.assertEqual(tree.path_max(v[0], v[2]).max_cost, 7)
+        self.assertEqual(tree.path_max(0, 1).max_cost, 2)
+        self.assertIsNone(tree.expose(2, 3))
+
+    def test_flushes_at_limit(self):
+        tree = Tree(write_back=4)
+        for i in range(6):
+            tree.link(i, i + 1, 1)
+        self.assertEqual(tree.pending_updates, 2)
+        self.assertEqual(tree.flush(), 2)
+        self.assertEqual(tree.flush(), 0)
+        self.assertEqual(len(tree.roots), 1)
+
+    def test_matches_immediate_mode(self):
+        rng = random.Random(2)
+        immediate, deferred = Tree(), Tree(write_back=64)
+        leaves = []
+        for i in range(1, 200):
+            j, w = rng.randrange(i), rng.randint(1, 50)
+            leaves.append((immediate.link(i, j, w), deferred.link(i, j, w)))
+        for k in rng.sample(range(len(leaves)), 60):
+            for tree, leaf in zip((immediate, deferred), leaves[k]):
+                tree.cut(leaf)
+        for _ in range(100):
+            u, v = rng.sample(range(200), 2)
+            a, b = immediate.path_max(u, v), deferred.path_max(u, v)
+            self.assertEqual(a and a.max_cost, b and b.max_cost)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,9 +1,12 @@
 from typing import Optional
-from collections import deque
+from collections import deque, OrderedDict
 from enum import Enum
+import weakref
+import sys
+import threading
 from dataclasses import dataclass
 from collections import deque
-@dataclass()
+@dataclass(slots=True)
 class Vertex:
     """
     Represents a vertex in a graph structure.
@@ -37,18 +40,22 @@ for i in range(len(adj)):
     def copy(self):
         return Vertex(self.name)
     
-    def get_internal_clusters(self):
+    def get_internal_clusters(self, seen=None):
+        # seen holds the ids of clusters already collected by the same caller, the walk stops at
+        # the first of them; it is per call so that concurrent readers do not share marks
         if not self.first_internal_cluster: 
             return []
+        if seen is None:
+            seen = set()
         
         assert self.first_internal_cluster.get_type != ClusterType.LEAF, "Leaf cluster cannot be the internal cluster"
         internal_clusters = []
         ptr = self.first_internal_cluster
         while ptr is not None:
-            if ptr.marked:
+            if id(ptr) in seen:
                 break
             internal_clusters.append(ptr)
-            ptr.marked = True
+            seen.add(id(ptr))
             ptr = ptr.par
         return internal_clusters
     
@@ -85,6 +92,8 @@ class Arc:
             Checks if the arc can perform a "compress" operation with its successor.
     """
     
+    __slots__ = ('cluster', 'head', 'next', 'prev')
+
     def __init__(self,cluster : 'Cluster' = None, head : Vertex = None, next : 'Arc' = None, prev : 'Arc' = None):
         self.cluster : Cluster = cluster
         self.head : Vertex = head
@@ -132,7 +141,10 @@ class ClusterType(Enum):
     INVALID = 5
 
 class Cluster:
-    
+    # slots keep the per-cluster footprint down on large trees; __weakref__ is for PathCache
+    __slots__ = ('par', 'left', 'right', 'data', 'arc1', 'arc2', 'in_list', 'marked',
+                 'edge_count', 'total_weight', 'max_weight', 'key', 'top', '__weakref__')
+
     def __init__(self, head=None, tail=None, data=None, left=None, right=None, par=None,in_list=False):
         """
         Attributes:
@@ -143,7 +155,15 @@ class Cluster:
             arc1 (Arc): Arc instance initialized using the head parameter.
             arc2 (Arc): Arc instance initialized using the tail parameter.
             in_list (bool): Indicates if the cluster is in a list.
-            marked (bool): A flag used for marking the cluster, this is used in the expose operation.
+            marked (bool): A flag for marking the cluster during traversals. expose no longer uses
+            it, it keeps its marks in a per-call set so that queries do not write to the tree.
+            edge_count (int): Number of tree edges in the cluster, raked subtrees included. A cluster
+            is connected, so it spans edge_count + 1 vertices.
+            total_weight: Sum of the edge weights in the cluster.
+            max_weight: Largest edge weight in the cluster (None while the cluster has no edges).
+            key: Smallest key set on a leaf in the cluster with Tree.set_key (None when no leaf has one).
+            top (Optional[list[Data]]): The heaviest edges on the cluster path, heaviest first, at
+            most top_k of them. Only kept when the tree was created with top_k > 0.
         """
         self.par : Optional[Cluster] = par
         self.left : Optional[Cluster] = left
@@ -153,16 +173,46 @@ class Cluster:
         self.arc2 : Arc = Arc(cluster=self, head=tail)
         self.in_list = in_list 
         self.marked = False
+        self.edge_count = 0
+        self.total_weight = 0
+        self.max_weight = None
+        self.key = None
+        self.top : Optional[list[Data]] = None
+        if left is not None:
+            self.update_summary()
 
-    def get_height(self):
-        if self.left is None and self.right is None:
-            return 1
-        elif self.left is None:
-            return 1 + self.right.get_height()
-        elif self.right is None:
-            return 1 + self.left.get_height()
+    def update_summary(self):
+        left, right = self.left, self.right
+        if right is None:
+            self.edge_count = left.edge_count
+            self.total_weight = left.total_weight
+            self.max_weight = left.max_weight
+            self.key = left.key
+            return
+        self.edge_count = left.edge_count + right.edge_count
+        self.total_weight = left.total_weight + right.total_weight
+        if left.max_weight is None or (right.max_weight is not None and right.max_weight > left.max_weight):
+            self.max_weight = right.max_weight
         else:
-            return 1 + max(self.left.get_height(), self.right.get_height())
+            self.max_weight = left.max_weight
+        if left.key is None or (right.key is not None and right.key < left.key):
+            self.key = right.key
+        else:
+            self.key = left.key
+
+    def get_height(self):
+        # iterative, deep trees would overflow the recursion limit
+        height = 0
+        stack = [(self, 1)]
+        while stack:
+            cluster, depth = stack.pop()
+            if depth > height:
+                height = depth
+            if cluster.left is not None:
+                stack.append((cluster.left, depth + 1))
+            if cluster.right is not None:
+                stack.append((cluster.right, depth + 1))
+        return height
         
     def get_levels(self):
         levels = []
@@ -225,7 +275,7 @@ class Cluster:
         self.right = None
         return self.left, self.right
     
-    def join(self, cluster_to_join, join_type):
+    def join(self, cluster_to_join, join_type, top_k=0):
         # join data of children clusters
         move_arc = None
         if self.arc1.next is cluster_to_join.arc1 or self.arc1.next is cluster_to_join.arc2:
@@ -246,11 +296,14 @@ class Cluster:
             compressed_with = move_arc.next
             new_cluster = Cluster(compressed_with.get_twin().get_tail(), move_arc.get_twin().head, new_data, move_arc.cluster, compressed_with.cluster)
             move_arc.head.first_internal_cluster = new_cluster
+            if top_k:
+                new_cluster.top = merge_top(self.top, cluster_to_join.top, top_k)
         elif join_type == ClusterType.RAKE:
             # print('rake')
             raked_on_to = move_arc.next
             new_cluster = Cluster(raked_on_to.head, raked_on_to.get_tail(), raked_on_to.cluster.data, move_arc.cluster, raked_on_to.cluster)
             move_arc.get_tail().first_internal_cluster = new_cluster
+            new_cluster.top = raked_on_to.cluster.top
         else:
             raise Exception("Invalid join type")
         return new_cluster
@@ -262,11 +315,11 @@ class Cluster:
             return ClusterType.DUMMY
         elif (
             (
-                self.right.arc1.head == self.arc1.head
-                and self.right.arc2.head == self.arc2.head
+                self.right.arc1.head is self.arc1.head
+                and self.right.arc2.head is self.arc2.head
             ) or (
-                self.right.arc1.head == self.arc2.head
-                and self.right.arc2.head == self.arc1.head
+                self.right.arc1.head is self.arc2.head
+                and self.right.arc2.head is self.arc1.head
             )
         ):
             return ClusterType.RAKE
@@ -330,12 +383,63 @@ class Cluster:
             neighbors.append(self.arc2.prev.cluster)
             self.arc2.prev.cluster.in_list = True
 
+    def refresh(self, top_k=0):
+        # recompute data and summary from the children, after a weight changed below this cluster
+        cluster_type = self.get_type()
+        if cluster_type == ClusterType.RAKE:
+            self.data = self.right.data
+            self.top = self.right.top
+        elif cluster_type == ClusterType.COMPRESS:
+            if self.left.data.max_cost > self.right.data.max_cost:
+                self.data = self.left.data
+            else:
+                self.data = self.right.data
+            if top_k:
+                self.top = merge_top(self.left.top, self.right.top, top_k)
+        elif cluster_type == ClusterType.DUMMY:
+            self.data = self.left.data
+            self.top = self.left.top
+        else:
+            return
+        self.update_summary()
+
     def create_dummy(self):
         dummy = Cluster(self.arc1.head, self.arc2.head, self.data, self)
+        dummy.top = self.top
         return dummy
 
+
+def merge_top(a : list['Data'], b : list['Data'], k : int) -> list['Data']:
+    # merge two heaviest-first lists of path edges, keeping the k heaviest
+    merged = []
+    i = j = 0
+    while len(merged) < k and (i < len(a) or j < len(b)):
+        if j >= len(b) or (i < len(a) and a[i].max_cost >= b[j].max_cost):
+            merged.append(a[i])
+            i += 1
+        else:
+            merged.append(b[j])
+            j += 1
+    return merged
+
+@dataclass
+class ComponentSummary:
+    """
+    Totals for the tree containing a vertex, read from its root cluster.
+    Attributes:
+        vertices (int): Number of vertices in the component.
+        edges (int): Number of tree edges in the component.
+        total_weight: Sum of the edge weights.
+        max_weight: Largest edge weight, None for an isolated vertex.
+    """
+    vertices : int = 1
+    edges : int = 0
+    total_weight : int = 0
+    max_weight : Optional[int] = None
+
 class Data:
-    
+    __slots__ = ('max_cost', 'ptr')
+
     def __init__(self, max_cost=None, ptr=None):
         self.max_cost = max_cost
         self.ptr = ptr
@@ -343,26 +447,489 @@ class Data:
 
 
 
+class PathCache:
+    """
+    LRU cache of expose results keyed by vertex pair.
+    Attributes:
+        capacity (int): Maximum number of cached pairs.
+        entries (OrderedDict): (u.name, v.name) in a fixed order per pair -> (root, version, result),
+        least recently used first.
+        versions (WeakKeyDictionary): Version of each root cluster. Updates bump the versions of the
+        roots they touch, so only entries of the affected components become stale.
+        hits, misses, evictions, invalidations (int): Counters, see stats().
+        lock (threading.Lock): Serializes readers that query the same tree from several threads.
+    """
+
+    def __init__(self, capacity : int):
+        self.capacity = capacity
+        self.entries : OrderedDict = OrderedDict()
+        self.versions = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def bump(self, root : 'Cluster'):
+        with self.lock:
+            self.versions[root] = self.versions.get(root, 0) + 1
+
+    def get(self, key, root : 'Cluster'):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                cached_root, version, result = entry
+                if cached_root is root and self.versions.get(root, 0) == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+                self.invalidations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, root : 'Cluster', result : 'Cluster'):
+        with self.lock:
+            self.entries[key] = (root, self.versions.get(root, 0), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
 class Tree:
     
-    def __init__(self):
-        self.roots : list[Cluster] = []
+    def __init__(self, path_cache_size : int = 0, top_k : int = 0, write_back : int = 0):
+        # root clusters in insertion order, a dict so that membership tests stay O(1) on large forests
+        self.__roots : dict[Cluster, None] = {}
+        # interned vertex records, so callers can pass plain integer ids
+        self.vertices : dict[int, Vertex] = {}
+        # expose results are cached only when a cache size is given
+        self.path_cache : Optional[PathCache] = PathCache(path_cache_size) if path_cache_size > 0 else None
+        # every cluster keeps the top_k heaviest edges of its path, for path_top_k queries
+        self.top_k = top_k
+        # write-back mode: links and cuts wait here and are applied as one update before the next
+        # query, or once write_back of them are pending (0 applies every update immediately)
+        self.write_back = write_back
+        self.__pending_links : dict[Cluster, None] = {}
+        self.__pending_cuts : dict[Cluster, None] = {}
+        self.__cut_pairs : dict[tuple[int, int], Cluster] = {}
+        # queries flush first, so readers on several threads may flush together: one applies the
+        # pending updates and the others wait until it is done
+        self.__flush_lock = threading.Lock()
     
+    @property
+    def roots(self) -> list[Cluster]:
+        self.flush()
+        return list(self.__roots)
+
+    @property
+    def pending_updates(self) -> int:
+        return len(self.__pending_links) + len(self.__pending_cuts)
+
+    @classmethod
+    def from_forest(cls, edges, path_cache_size : int = 0, top_k : int = 0, write_back : int = 0):
+        # Bulk load: all leaf clusters enter the level 1 Euler tours in one pass and every
+        # following level is contracted once over the whole forest, instead of n separate links.
+        groups = {}
+        def find(x):
+            while x in groups:
+                if groups[x] in groups:
+                    groups[x] = groups[groups[x]]
+                x = groups[x]
+            return x
+        tree = cls(path_cache_size, top_k, write_back)
+        edges = [(tree.vertex(u), tree.vertex(v), c) for u, v, c in edges]
+        for u, v, _ in edges:
+            root_u, root_v = find(id(u)), find(id(v))
+            if root_u == root_v:
+                raise ValueError(f"Edge ({u}, {v}) closes a cycle, the edges are not a forest")
+            groups[root_u] = root_v
+
+        tree.link_many(edges)
+        tree.flush()
+        return tree
+
     def print_tree(self,et=True):
-        for i,root in enumerate(self.roots):
+        self.flush()
+        for i,root in enumerate(self.__roots):
             print(f'Root {i}')
             root.print_tree(et=et)
     
+    def vertex(self, u) -> Vertex:
+        # the vertex record for an integer id, created on first use; a Vertex object is resolved
+        # by name, so there is exactly one record per name (the first object seen becomes it)
+        if isinstance(u, Vertex):
+            return self.vertices.setdefault(u.name, u)
+        record = self.vertices.get(u)
+        if record is None:
+            record = Vertex(u)
+            self.vertices[u] = record
+        return record
+
+    def __find_vertex(self, u) -> Optional[Vertex]:
+        if isinstance(u, Vertex):
+            return self.vertices.get(u.name)
+        return self.vertices.get(u)
+
+    def __invalidate(self, *ptrs):
+        # bump the version of every component root above the given vertices or clusters
+        if self.path_cache is None:
+            return
+        for ptr in ptrs:
+            if isinstance(ptr, Vertex):
+                if not ptr.handle:
+                    continue
+                root = ptr.get_root()
+            else:
+                root = ptr
+                while root.par:
+                    root = root.par
+            self.path_cache.bump(root)
+
+    def memory_report(self):
+        # Object counts and estimated bytes per object kind, with clusters split by type and by
+        # contraction level (0 is the leaf level). Sizes are measured once per kind on a sample
+        # instance (object plus its attribute dict, if it has one), so the byte figures are estimates.
+        self.flush()
+        kinds = ('Vertex', 'Arc', 'Data') + tuple(t.name for t in (ClusterType.LEAF, ClusterType.RAKE, ClusterType.COMPRESS, ClusterType.DUMMY))
+        unit = {}
+        def size_of(kind, obj):
+            if kind not in unit:
+                unit[kind] = sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+            return unit[kind]
+
+        objects = dict.fromkeys(kinds, 0)
+        nbytes = dict.fromkeys(kinds, 0)
+        levels = []
+        seen_data = set()
+        seen_vertices = set()
+
+        def count(kind, obj, level=None):
+            objects[kind] += 1
+            nbytes[kind] += size_of(kind, obj)
+            if level is not None:
+                levels[level][kind] += 1
+                levels[level]['bytes'] += size_of(kind, obj)
+
+        for vertex in self.vertices.values():
+            seen_vertices.add(id(vertex))
+            count('Vertex', vertex)
+
+        for root in self.__roots:
+            # breadth first, one list per depth; the deepest list holds the leaves
+            depths = []
+            current = [root]
+            while current:
+                depths.append(current)
+                current = [child for cluster in current for child in (cluster.left, cluster.right) if child is not None]
+            while len(levels) < len(depths):
+                levels.append({'LEAF': 0, 'RAKE': 0, 'COMPRESS': 0, 'DUMMY': 0, 'Arc': 0, 'bytes': 0})
+            for depth, clusters in enumerate(depths):
+                level = len(depths) - 1 - depth
+                for cluster in clusters:
+                    count(cluster.get_type().name, cluster, level)
+                    count('Arc', cluster.arc1, level)
+                    count('Arc', cluster.arc2, level)
+                    if cluster.data is not None and id(cluster.data) not in seen_data:
+                        seen_data.add(id(cluster.data))
+                        count('Data', cluster.data)
+                    if level == 0:
+                        for vertex in (cluster.arc1.head, cluster.arc2.head):
+                            if id(vertex) not in seen_vertices:
+                                seen_vertices.add(id(vertex))
+                                count('Vertex', vertex)
+
+        index_bytes = sys.getsizeof(self.vertices) + sys.getsizeof(self.__roots)
+        return {
+            'objects': objects,
+            'bytes': nbytes,
+            'levels': levels,
+            'index_bytes': index_bytes,
+            'total_bytes': sum(nbytes.values()) + index_bytes,
+        }
+
+    def cache_stats(self):
+        if self.path_cache is None:
+            return None
+        return self.path_cache.stats()
+
+    def update_weight(self, cluster, c):
+        # change the weight of a forest edge in place: only the ancestors of its leaf cluster
+        # are recomputed, the Euler tours and the rake/compress structure stay as they are
+        assert cluster.get_type() == ClusterType.LEAF, "Weights live on leaf clusters"
+        self.__invalidate(cluster)
+        cluster.data.max_cost = c
+        cluster.total_weight = c
+        cluster.max_weight = c
+        ptr = cluster.par
+        while ptr is not None:
+            ptr.refresh(self.top_k)
+            ptr = ptr.par
+
+    def set_key(self, cluster, key):
+        # Attach a key to a forest edge (None removes it). Every cluster keeps the smallest key
+        # below it, so min_key_edge finds the edge with the smallest key of a tree in O(log n).
+        # Keys of one tree must be comparable with each other.
+        assert cluster.get_type() == ClusterType.LEAF, "Keys live on leaf clusters"
+        cluster.key = key
+        ptr = cluster.par
+        while ptr is not None:
+            old = ptr.key
+            ptr.update_summary()
+            if ptr.key == old:
+                break
+            ptr = ptr.par
+
     def cut(self, cluster):
+        if cluster in self.__pending_links:
+            # linked and cut again before it ever reached the tree
+            del self.__pending_links[cluster]
+            return
+        self.__invalidate(cluster)
+        if self.write_back:
+            self.__pending_cuts[cluster] = None
+            self.__cut_pairs[self.__pair(cluster.arc1.head, cluster.arc2.head)] = cluster
+            self.__flush_if_full()
+            return
         cluster.in_list = True
         self.__update([], [cluster])
 
-    def link(self, u,v,c):
+    def flush(self):
+        # apply the pending links and cuts as one update, returns how many there were
+        with self.__flush_lock:
+            if not self.__pending_links and not self.__pending_cuts:
+                return 0
+            insert, delete = list(self.__pending_links), list(self.__pending_cuts)
+            self.__pending_links.clear()
+            self.__pending_cuts.clear()
+            self.__cut_pairs.clear()
+            for cluster in delete:
+                cluster.in_list = True
+            self.__update(insert, delete)
+            return len(insert) + len(delete)
+
+    def __flush_if_full(self):
+        if len(self.__pending_links) + len(self.__pending_cuts) >= self.write_back:
+            self.flush()
+
+    @staticmethod
+    def __pair(u, v):
+        return (id(u), id(v)) if id(u) < id(v) else (id(v), id(u))
+
+    def __cancel_cut(self, u, v, c):
+        # a link that restores an edge whose cut is still pending takes the old leaf back
+        cluster = self.__cut_pairs.pop(self.__pair(u, v), None)
+        if cluster is None or cluster not in self.__pending_cuts:
+            return None
+        del self.__pending_cuts[cluster]
+        if cluster.data.max_cost != c:
+            self.update_weight(cluster, c)
+        return cluster
+
+    def __new_leaf(self, u, v, c):
         new_clus = Cluster(u,v,in_list=True)
-        d = Data(c,new_clus)
-        new_clus.data = d
+        new_clus.data = Data(c,new_clus)
+        new_clus.edge_count = 1
+        new_clus.total_weight = c
+        new_clus.max_weight = c
+        if self.top_k:
+            new_clus.top = [new_clus.data]
+        return new_clus
+
+    def link(self, u,v,c):
+        u, v = self.vertex(u), self.vertex(v)
+        if self.__pending_cuts:
+            cluster = self.__cancel_cut(u, v, c)
+            if cluster is not None:
+                return cluster
+        self.__invalidate(u, v)
+        new_clus = self.__new_leaf(u, v, c)
 
+        if self.write_back:
+            self.__pending_links[new_clus] = None
+            self.__flush_if_full()
+            return new_clus
         self.__update([new_clus], [])
+        return new_clus
+
+    def link_many(self, edges):
+        # the edges must not close a cycle, neither among themselves nor with the forest
+        new_clusters = []
+        for u, v, c in edges:
+            u, v = self.vertex(u), self.vertex(v)
+            self.__invalidate(u, v)
+            new_clusters.append(self.__new_leaf(u, v, c))
+        if self.write_back:
+            self.__pending_links.update(dict.fromkeys(new_clusters))
+            self.__flush_if_full()
+        elif new_clusters:
+            self.__update(new_clusters, [])
+        return new_clusters
+
+    def connected(self, u, v):
+        if u is v or (not isinstance(u, Vertex) and u == v):
+            return True
+        self.flush()
+        u, v = self.__find_vertex(u), self.__find_vertex(v)
+        if u is None or v is None:
+            return False
+        if u is v:
+            return True
+        if not u.handle or not v.handle:
+            return False
+        return u.get_root() is v.get_root()
+
+    def component_summary(self, v) -> Optional[ComponentSummary]:
+        self.flush()
+        v = self.__find_vertex(v)
+        if v is None:
+            return None
+        if not v.handle:
+            return ComponentSummary()
+        root = v.get_root()
+        return ComponentSummary(root.edge_count + 1, root.edge_count, root.total_weight, root.max_weight)
+
+    def min_key_edge(self, v) -> Optional[Cluster]:
+        # leaf cluster with the smallest key in the tree of v, None when no edge there has a key
+        self.flush()
+        v = self.__find_vertex(v)
+        if v is None or not v.handle:
+            return None
+        ptr = v.get_root()
+        if ptr.key is None:
+            return None
+        while ptr.left is not None:
+            ptr = ptr.left if ptr.right is None or ptr.left.key == ptr.key else ptr.right
+        return ptr
+
+    def incident_edge(self, v) -> Optional[Cluster]:
+        # leaf cluster of some forest edge at v, None when v has none
+        self.flush()
+        v = self.__find_vertex(v)
+        if v is None or not v.handle:
+            return None
+        return v.handle.cluster
+
+    def expose_set(self, vertices):
+        # Virtual tree spanned by a set of terminals, as a list of (a, b, data) edges where a and b
+        # are terminals or branching vertices and data is the heaviest edge between them.
+        # Returns None when the terminals are not all in one tree.
+        self.flush()
+        terminals = {}
+        for x in vertices:
+            x = self.__find_vertex(x)
+            if x is None:
+                return None
+            terminals[id(x)] = x
+        if len(terminals) < 2:
+            return []
+        terminals = list(terminals.values())
+        if any(not t.handle for t in terminals):
+            return None
+        root = terminals[0].get_root()
+        if any(t.get_root() is not root for t in terminals[1:]):
+            return None
+
+        # clusters on the root paths of all terminals, each visited once
+        chain_ids = set()
+        chains = []
+        for t in terminals:
+            ptr = t.first_internal_cluster
+            while ptr is not None and id(ptr) not in chain_ids:
+                chain_ids.add(id(ptr))
+                chains.append(ptr)
+                ptr = ptr.par
+        # their other children partition the tree into pieces whose endpoints include every terminal
+        if chains:
+            pieces = [child for cluster in chains for child in (cluster.left, cluster.right)
+                      if child is not None and id(child) not in chain_ids]
+        else:
+            pieces = [root]
+
+        ends = {}
+        incident = {}
+        edges = []
+        for piece in pieces:
+            a, b = piece.arc1.head, piece.arc2.head
+            ends[id(a)], ends[id(b)] = a, b
+            incident.setdefault(id(a), set()).add(len(edges))
+            incident.setdefault(id(b), set()).add(len(edges))
+            edges.append((id(a), id(b), piece.data))
+        terminal_ids = {id(t) for t in terminals}
+
+        def drop(e):
+            a, b, _ = edges[e]
+            incident[a].discard(e)
+            incident[b].discard(e)
+            edges[e] = None
+
+        # prune branches that hold no terminal
+        stack = [x for x in incident if x not in terminal_ids and len(incident[x]) == 1]
+        while stack:
+            x = stack.pop()
+            if len(incident[x]) != 1:
+                continue
+            e = next(iter(incident[x]))
+            a, b, _ = edges[e]
+            drop(e)
+            other = b if a == x else a
+            if other not in terminal_ids and len(incident[other]) == 1:
+                stack.append(other)
+        # splice out pass-through vertices
+        for x in list(incident):
+            if x in terminal_ids or len(incident[x]) != 2:
+                continue
+            e, f = incident[x]
+            a1, b1, d1 = edges[e]
+            a2, b2, d2 = edges[f]
+            drop(e)
+            drop(f)
+            y = b1 if a1 == x else a1
+            z = b2 if a2 == x else a2
+            incident[y].add(len(edges))
+            incident[z].add(len(edges))
+            edges.append((y, z, d1 if d1.max_cost >= d2.max_cost else d2))
+        return [(ends[a], ends[b], data) for a, b, data in (edge for edge in edges if edge is not None)]
+
+    def path_top_k(self, u, v, k):
+        # the k heaviest edges on the path from u to v as (weight, leaf cluster), heaviest first
+        if k < 0:
+            raise ValueError(f"k must not be negative, got {k}")
+        if k > self.top_k:
+            raise ValueError(f"Tree keeps the top {self.top_k} path edges, {k} requested")
+        # None for vertices in different trees whatever k is, the empty path of a vertex to itself
+        # has no edges
+        if not self.connected(u, v):
+            return None
+        if k == 0:
+            return []
+        C = self.expose(u, v)
+        if C is None:
+            return []
+        return [(data.max_cost, data.ptr) for data in C.top[:k]]
+
+    def path_max(self, u, v):
+        C = self.expose(u, v)
+        if C is None:
+            return None
+        return C.data
 
 
     def __is_move_valid(self, a : Arc, exposed_u, exposed_v) -> ClusterType:
@@ -376,15 +943,15 @@ class Tree:
                     exposed_u is None 
                     or
                     (
-                        a.head != exposed_u
-                        and b.get_tail() != exposed_u
+                        a.head is not exposed_u
+                        and b.get_tail() is not exposed_u
                     )
                 ) and (
                     exposed_v is None 
                     or
                     (
-                        a.head != exposed_v
-                        and b.get_tail() != exposed_v
+                        a.head is not exposed_v
+                        and b.get_tail() is not exposed_v
                     )
                 ) and (
                     a.can_compress()
@@ -396,13 +963,13 @@ class Tree:
                     exposed_u is None 
                     or
                     (
-                        a.get_tail() != exposed_u
+                        a.get_tail() is not exposed_u
                     )
                 ) and (
                     exposed_v is None 
                     or
                     (
-                        a.get_tail() != exposed_v
+                        a.get_tail() is not exposed_v
                     )
                 ) and (
                     a.can_rake()
@@ -413,14 +980,19 @@ class Tree:
             return ClusterType.INVALID
     def __remove_from_euler_tour(self, clusters: list[Cluster], neighbors: list[Cluster], delete_next: list[Cluster]):
         for cluster in clusters:
+            if cluster.left is not None:
+                # the vertex made internal by this cluster is exposed again
+                if cluster.left.arc1.head.first_internal_cluster is cluster:
+                    cluster.left.arc1.head.first_internal_cluster = None
+                if cluster.left.arc2.head.first_internal_cluster is cluster:
+                    cluster.left.arc2.head.first_internal_cluster = None
             a = cluster.arc1
             b = cluster.arc2
             if not a.next or  not b.next:
                 continue
             cluster.add_neighbors(neighbors)
             
-            if cluster in self.roots:
-                self.roots.remove(cluster)
+            self.__roots.pop(cluster, None)
             a.prev.next = b.next
             b.next.prev = a.prev
             b.prev.next = a.next
@@ -430,9 +1002,6 @@ class Tree:
                     delete_next.append(cluster.par)
                     cluster.par.in_list = True
                 cluster.par.split()
-                if cluster.par in self.roots:
-                    self.roots.append(cluster.left)
-                    self.roots.append(cluster.right)
                 
 
             # handle logic not tested
@@ -497,13 +1066,13 @@ class Tree:
         elif cluster.get_type() == ClusterType.DUMMY:
             A = cluster.left 
         elif cluster.get_type() == ClusterType.COMPRESS:
-            if cluster.left.arc1.head == w or cluster.left.arc2.head == w:
+            if cluster.left.arc1.head is w or cluster.left.arc2.head is w:
                 A = cluster.left
             else:
                 A = cluster.right
         
 
-        if A.arc1.head == w:
+        if A.arc1.head is w:
             a = A.arc1
         else:
             a = A.arc2
@@ -513,7 +1082,7 @@ class Tree:
 
         B = b.cluster
         P = B.par
-        if w == P.arc1.get_tail():
+        if w is P.arc1.get_tail():
             return P.arc1
         else:
             return P.arc2
@@ -529,11 +1098,11 @@ class Tree:
         elif cluster.get_type() == ClusterType.DUMMY:
             A = cluster.left
         elif cluster.get_type() == ClusterType.COMPRESS:
-            if cluster.left.arc1.get_tail() == v or cluster.left.arc2.get_tail() == v:
+            if cluster.left.arc1.get_tail() is v or cluster.left.arc2.get_tail() is v:
                 A = cluster.left
             else:
                 A = cluster.right
-        if A.arc1.get_tail() == v:
+        if A.arc1.get_tail() is v:
             a = A.arc1
         else:
             a = A.arc2
@@ -542,7 +1111,7 @@ class Tree:
             b = b.prev
         B = b.cluster
         P = B.par
-        if v == P.arc1.head:
+        if v is P.arc1.head:
             return P.arc1
         else:
             return P.arc2
@@ -570,9 +1139,10 @@ class Tree:
             else:
                 matched_moves.append(cluster)
 
-        for cluster_to_remove in matched_moves:
-            neighbors.remove(cluster_to_remove)
-            cluster_to_remove.in_list = False
+        if matched_moves:
+            for cluster_to_remove in matched_moves:
+                cluster_to_remove.in_list = False
+            neighbors[:] = [cluster for cluster in neighbors if cluster.in_list]
 
     def __insert_into_euler_tour_rest(self, clusters: list[Cluster], neighbors: list[Cluster]):
         for cluster in clusters:
@@ -587,7 +1157,7 @@ class Tree:
 
             cluster.add_neighbors(neighbors)
 
-    def  __perform_valid_move(self, a: Arc, delete_next: list[Cluster], insert_next: list[Cluster], performed_moves: list[Cluster], exposed_u=None, exposed_v=None) -> bool:
+    def  __perform_valid_move(self, a: Arc, delete_next: list[Cluster], insert_next: list[Cluster], performed_moves: set[Cluster], exposed_u=None, exposed_v=None) -> bool:
         cluster = a.cluster
         b = a.next
         b_clus = b.cluster
@@ -609,18 +1179,16 @@ class Tree:
                     b_clus.par.in_list = True
                 # insert_next.append(cluster)
 
-                new_cluster = cluster.join(b_clus, validity)
+                new_cluster = cluster.join(b_clus, validity, self.top_k)
                 
-                if cluster in self.roots:
-                    self.roots.remove(cluster)
-                if b_clus in self.roots:
-                    self.roots.remove(b_clus)
+                self.__roots.pop(cluster, None)
+                self.__roots.pop(b_clus, None)
                 cluster.par = new_cluster
                 b_clus.par = new_cluster
                 insert_next.append(new_cluster)
                 new_cluster.in_list = True
-                performed_moves.append(cluster)
-                performed_moves.append(b_clus)
+                performed_moves.add(cluster)
+                performed_moves.add(b_clus)
                 
                 return True
         
@@ -628,7 +1196,7 @@ class Tree:
                 
         
     def __new_moves(self,clusters: list[Cluster], neighbors : list[Cluster], delete_next: list[Cluster], insert_next: list[Cluster],exposed_u=None,exposed_v=None) -> bool:
-        performed_moves = []
+        performed_moves = set()
         
         for cluster in clusters + neighbors:
             if not self.__perform_valid_move(cluster.arc1, delete_next, insert_next, performed_moves,exposed_u,exposed_v):
@@ -639,13 +1207,17 @@ class Tree:
                 continue
             
             if cluster.is_root():
-                self.roots.append(cluster)
+                if cluster.par is not None:
+                    if not cluster.par.in_list:
+                        delete_next.append(cluster.par)
+                        cluster.par.in_list = True
+                    cluster.par = None
+                self.__roots[cluster] = None
                 continue
             if cluster.par and not cluster.par.in_list:
                 delete_next.append(cluster.par)
                 cluster.par.in_list = True
-            if cluster in self.roots: 
-                self.roots.remove(cluster)
+            self.__roots.pop(cluster, None)
             dummy = cluster.create_dummy()
             cluster.par = dummy
             insert_next.append(dummy)
@@ -676,17 +1248,36 @@ class Tree:
             delete = delete_next
             insert = insert_next
             
-    def expose(self, u : Vertex, v : Vertex):
+    def expose(self, u, v):
         # print(f'Exposing {u} and {v} gives following clusters:')
+        self.flush()
+        u, v = self.__find_vertex(u), self.__find_vertex(v)
+        if u is None or v is None or u is v:
+            return None
         if not u.handle or not v.handle:             
             return None
         
-        if u.get_root() is not v.get_root():
+        root = u.get_root()
+        if root is not v.get_root():
             # vertices belong to different trees
             return None
-        
-        u_internal = u.get_internal_clusters()
-        v_internal = v.get_internal_clusters()
+
+        if self.path_cache is None:
+            return self.__expose(u, v)
+        # the path is the same both ways; names may mix ints and strings, so order them by vertex
+        key = (u.name, v.name) if id(u) < id(v) else (v.name, u.name)
+        result = self.path_cache.get(key, root)
+        if result is None:
+            result = self.__expose(u, v)
+            self.path_cache.put(key, root, result)
+        return result
+
+    def __expose(self, u : Vertex, v : Vertex):
+        # read-only on this tree: marks live in a local set and the rebuilt clusters belong to a
+        # temporary tree, so several threads can expose on a tree that is not being updated
+        marked = set()
+        u_internal = u.get_internal_clusters(marked)
+        v_internal = v.get_internal_clusters(marked)
         # vertices belong to same tree
         
         to_insert = []
@@ -695,16 +1286,14 @@ class Tree:
             return u.get_root()
         
         for cluster in internals:
-            if cluster.left is not None and not cluster.left.marked :
+            if cluster.left is not None and id(cluster.left) not in marked:
                 to_insert.append(cluster.left)
-                cluster.left.marked = True
+                marked.add(id(cluster.left))
                 
-            if cluster.right is not None and not cluster.right.marked:
+            if cluster.right is not None and id(cluster.right) not in marked:
                 to_insert.append(cluster.right)
-                cluster.right.marked = True
+                marked.add(id(cluster.right))
                 
-        for cluster in internals + to_insert:
-            cluster.marked = False
         I = []
         new_vertices = {}
         for clus in to_insert:
@@ -717,8 +1306,9 @@ class Tree:
             if j.name not in new_vertices:
                 new_vertices[j.name] = Vertex(j.name)
             I.append(Cluster(new_vertices[i.name], new_vertices[j.name], clus.data, in_list=True))
+            I[-1].top = clus.top
             
-        temporary_tree = Tree()
+        temporary_tree = Tree(top_k=self.top_k)
         temporary_tree.__update(I, [], new_vertices[u.name], new_vertices[v.name])
         # assert temporary tree has one root
         assert len(temporary_tree.roots) == 1, "Temporary tree has more than one root"